@@ -1,10 +1,13 @@
 """Demo training script for OpenGraphs."""
 
+import atexit
 import math
 import os
+import queue
 import random
 import subprocess
 import sys
+import threading
 import time
 
 try:
@@ -12,6 +15,23 @@ try:
 except Exception:
     psutil = None
 
+try:
+    from og_agent_chat.client import send_metrics
+except Exception:
+    send_metrics = None
+
+# NVML is initialized once and the device handle reused across samples, so
+# polling GPU stats does not fork nvidia-smi on every call.
+try:
+    import pynvml
+
+    pynvml.nvmlInit()
+    atexit.register(pynvml.nvmlShutdown)
+    _NVML_HANDLE = pynvml.nvmlDeviceGetHandleByIndex(0)
+except Exception:
+    pynvml = None
+    _NVML_HANDLE = None
+
 # ── Hyperparameters ──────────────────────────────────────────────────────
 # Intentionally bad defaults for the demo run:
 # 1) base LR is too high
@@ -24,6 +44,9 @@ BATCH_SIZE = int(os.getenv("DEMO_BATCH", "32"))
 SLEEP_PER_STEP = 0.3
 WARMUP_STEPS = 20
 PEAK_LR_MULT = 1.0
+METRIC_QUEUE_SIZE = 4096
+WRITER_FLUSH_EVERY = 10
+CPU_STATS_MIN_INTERVAL = 1.0
 
 # ── Helpers ──────────────────────────────────────────────────────────────
 
@@ -44,50 +67,128 @@ def get_tb_writer():
     return None
 
 
-def report(metric, value, step):
+# Metric I/O (daemon socket + TensorBoard) runs on a single background worker
+# so the training loop only pays for an enqueue. Updates that do not fit in the
+# bounded queue are dropped and counted rather than stalling the step.
+_METRIC_Q = queue.Queue(maxsize=METRIC_QUEUE_SIZE)
+_dropped_metrics = 0
+
+
+def _metric_worker():
+    while True:
+        item = _METRIC_Q.get()
+        try:
+            if item is None:
+                return
+            fn, args, kwargs = item
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                pass
+        finally:
+            _METRIC_Q.task_done()
+
+
+def _enqueue(fn, *args, **kwargs):
+    global _dropped_metrics
     try:
-        from og_agent_chat.client import send_metric
-        send_metric(metric, value, step=step)
-    except Exception:
-        pass
+        _METRIC_Q.put_nowait((fn, args, kwargs))
+    except queue.Full:
+        _dropped_metrics += 1
+
+
+def start_metric_worker():
+    worker = threading.Thread(target=_metric_worker, name="metric-reporter", daemon=True)
+    worker.start()
+    return worker
 
 
-def log(writer, tag, value, step):
+def stop_metric_worker(worker):
+    _METRIC_Q.put(None)
+    worker.join()
+
+
+def _write_step(writer, metrics, step):
+    # One metrics_batch request per step instead of one RPC per metric.
+    if send_metrics is not None:
+        try:
+            send_metrics(metrics, step=step)
+        except Exception:
+            pass
     if writer is not None:
-        writer.add_scalar(tag, value, step)
-        writer.flush()
+        for tag, val in metrics.items():
+            writer.add_scalar(tag, val, step)
+        if step % WRITER_FLUSH_EVERY == 0:
+            writer.flush()
+
+
+def _emit(step, metrics, writer):
+    """Hand one step's metrics to the worker as a single record and print it."""
+    if send_metrics is not None or writer is not None:
+        _enqueue(_write_step, writer, metrics, step)
+    print(
+        f"step {step:>4d} | loss={metrics['train/loss']:.4f} | acc={metrics['train/accuracy']:.4f} | "
+        f"base_lr={LEARNING_RATE:.4f} | eff_lr={metrics['train/lr_effective']:.4f}"
+    )
 
 
 def gpu_stats():
+    if _NVML_HANDLE is not None:
+        try:
+            mem = pynvml.nvmlDeviceGetMemoryInfo(_NVML_HANDLE)
+            return {
+                "gpu/temp_c": float(
+                    pynvml.nvmlDeviceGetTemperature(_NVML_HANDLE, pynvml.NVML_TEMPERATURE_GPU)
+                ),
+                "gpu/util_pct": float(pynvml.nvmlDeviceGetUtilizationRates(_NVML_HANDLE).gpu),
+                "gpu/mem_used_mb": mem.used / (1024 * 1024),
+                "gpu/mem_total_mb": mem.total / (1024 * 1024),
+                "gpu/power_w": pynvml.nvmlDeviceGetPowerUsage(_NVML_HANDLE) / 1000.0,
+            }
+        except Exception:
+            return {}
+    return _nvidia_smi_stats()
+
+
+_NVIDIA_SMI_KEYS = ("gpu/temp_c", "gpu/util_pct", "gpu/mem_used_mb", "gpu/mem_total_mb", "gpu/power_w")
+
+
+def _nvidia_smi_stats():
     try:
         out = subprocess.run(
             ["nvidia-smi", "--query-gpu=temperature.gpu,utilization.gpu,memory.used,memory.total,power.draw",
              "--format=csv,noheader,nounits"],
             capture_output=True, text=True, timeout=2,
         )
-        parts = [p.strip() for p in out.stdout.strip().split(",")]
-        if len(parts) >= 5:
-            return {
-                "gpu/temp_c": float(parts[0]),
-                "gpu/util_pct": float(parts[1]),
-                "gpu/mem_used_mb": float(parts[2]),
-                "gpu/mem_total_mb": float(parts[3]),
-                "gpu/power_w": float(parts[4]),
-            }
+        # Only the first GPU is reported; float() tolerates the padding spaces.
+        parts = out.stdout.partition("\n")[0].split(",")
+        if len(parts) >= len(_NVIDIA_SMI_KEYS):
+            return dict(zip(_NVIDIA_SMI_KEYS, map(float, parts)))
     except Exception:
         pass
     return {}
 
 
+# Total RAM never changes during a run; samples closer together than
+# CPU_STATS_MIN_INTERVAL reuse the previous reading.
+_RAM_TOTAL_MB = psutil.virtual_memory().total / (1024 * 1024) if psutil is not None else 0.0
+_last_cpu_sample = {"t": float("-inf"), "val": {}}
+
+
 def cpu_stats():
     if psutil is None:
         return {}
-    mem = psutil.virtual_memory()
-    return {
+    now = time.monotonic()
+    if now - _last_cpu_sample["t"] < CPU_STATS_MIN_INTERVAL:
+        return _last_cpu_sample["val"]
+    val = {
         "sys/cpu_pct": psutil.cpu_percent(interval=None),
-        "sys/ram_used_mb": mem.used / (1024 * 1024),
-        "sys/ram_total_mb": mem.total / (1024 * 1024),
+        "sys/ram_used_mb": psutil.virtual_memory().used / (1024 * 1024),
+        "sys/ram_total_mb": _RAM_TOTAL_MB,
     }
+    _last_cpu_sample["t"] = now
+    _last_cpu_sample["val"] = val
+    return val
 
 
 # ── Training loop ────────────────────────────────────────────────────────
@@ -100,29 +201,46 @@ def cpu_stats():
 # Optional quality-of-life fix for cleaner curves:
 # - BATCH_SIZE: 8 -> 32
 
-def scheduled_lr(step, base_lr):
-    if step <= WARMUP_STEPS:
-        return base_lr * (0.2 + 0.8 * step / max(1, WARMUP_STEPS))
-    # Keep LR too high after warmup on purpose.
-    return base_lr * PEAK_LR_MULT
+def build_lr_schedule(base_lr):
+    # The schedule depends only on module constants, so it is evaluated once
+    # and indexed by step. Keep LR too high after warmup on purpose.
+    warmup = max(1, WARMUP_STEPS)
+    return [
+        base_lr * (0.2 + 0.8 * step / warmup) if step <= WARMUP_STEPS else base_lr * PEAK_LR_MULT
+        for step in range(TOTAL_STEPS + 1)
+    ]
 
-def train():
-    lr = LEARNING_RATE
-    writer = get_tb_writer()
-    small_batch = BATCH_SIZE < 16
-    noise_std = 0.05 if small_batch else 0.02
 
-    print(f"[info] starting training: lr={lr}, steps={TOTAL_STEPS}, batch={BATCH_SIZE}")
-    sys.stdout.flush()
+LR_SCHEDULE = build_lr_schedule(LEARNING_RATE)
+
+
+def simulate_run(lr_schedule):
+    """Compute every step's (loss, acc, grad_norm) up front.
 
+    The simulated metrics do not depend on wall time, so the training loop
+    only has to emit precomputed values and sleep.
+    """
+    small_batch = BATCH_SIZE < 16
+    noise_std = 0.05 if small_batch else 0.02
     loss = 2.5
     acc = 0.10
-    if psutil is not None:
-        psutil.cpu_percent(interval=None)
+    records = [None]
+
+    # Draw every random series in one pass per distribution rather than
+    # interleaving RNG calls with the simulation branches.
+    rng = random.Random()
+    steps = range(TOTAL_STEPS + 1)
+    gauss, uniform = rng.gauss, rng.uniform
+    noise_draws = [gauss(0, noise_std) for _ in steps]
+    loss_drift = [gauss(0, 0.03) for _ in steps]
+    acc_drift = [gauss(0, 0.004) for _ in steps]
+    grad_draws = [abs(gauss(0.5, 0.25 if small_batch else 0.2)) for _ in steps]
+    spike_lo, spike_hi = (0.5, 0.9) if small_batch else (0.3, 0.8)
+    spikes = [uniform(spike_lo, spike_hi) for _ in steps]
 
     for step in range(1, TOTAL_STEPS + 1):
-        noise = random.gauss(0, noise_std)
-        eff_lr = scheduled_lr(step, lr)
+        noise = noise_draws[step]
+        eff_lr = lr_schedule[step]
 
         if eff_lr >= 0.005:
             # LR is too high: short early improvement, then instability.
@@ -131,8 +249,8 @@ def train():
                 loss = 2.5 * decay + noise
                 acc = min(0.60, 0.10 + (1 - decay) * 0.50 + noise * 0.35)
             else:
-                loss = loss + (0.03 if small_batch else 0.02) + random.gauss(0, 0.03)
-                acc = acc - (0.003 if small_batch else 0.002) + random.gauss(0, 0.004)
+                loss = loss + (0.03 if small_batch else 0.02) + loss_drift[step]
+                acc = acc - (0.003 if small_batch else 0.002) + acc_drift[step]
         else:
             # Stable LR: converges more smoothly.
             decay = math.exp(-eff_lr * step * 3.0)
@@ -144,37 +262,61 @@ def train():
 
         loss = max(0.01, loss)
         acc = max(0.0, min(1.0, acc))
-        grad_norm = abs(random.gauss(0.5, 0.25 if small_batch else 0.2))
+        grad_norm = grad_draws[step]
         if eff_lr >= 0.005 and step > 25:
-            grad_norm += random.uniform(0.5, 0.9) if small_batch else random.uniform(0.3, 0.8)
-        throughput = BATCH_SIZE / (SLEEP_PER_STEP + random.uniform(0, 0.05))
-
-        report("train/loss", loss, step)
-        report("train/accuracy", acc, step)
-        report("train/lr_effective", eff_lr, step)
-        report("train/grad_norm", grad_norm, step)
-        report("train/throughput", throughput, step)
-        log(writer, "train/loss", loss, step)
-        log(writer, "train/accuracy", acc, step)
-        log(writer, "train/lr_effective", eff_lr, step)
-        log(writer, "train/grad_norm", grad_norm, step)
-        log(writer, "train/throughput", throughput, step)
+            grad_norm += spikes[step]
+        records.append((loss, acc, grad_norm))
+
+    return records
+
 
+def train():
+    lr = LEARNING_RATE
+    writer = get_tb_writer()
+    worker = start_metric_worker()
+    records = simulate_run(LR_SCHEDULE)
+
+    # Every progress line ends in "\n", so line buffering flushes at the same
+    # points as the old explicit flushes even when stdout is a pipe.
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=True)
+
+    print(f"[info] starting training: lr={lr}, steps={TOTAL_STEPS}, batch={BATCH_SIZE}")
+
+    if psutil is not None:
+        psutil.cpu_percent(interval=None)
+
+    # Steps are scheduled against absolute target times so reporting overhead
+    # is absorbed into SLEEP_PER_STEP instead of stretching every period.
+    next_t = last_t = time.perf_counter()
+    for step in range(1, TOTAL_STEPS + 1):
+        eff_lr = LR_SCHEDULE[step]
+        loss, acc, grad_norm = records[step]
+        now = time.perf_counter()
+        period = now - last_t if step > 1 else SLEEP_PER_STEP
+        last_t = now
+        throughput = BATCH_SIZE / period if period > 0 else 0.0
+
+        metrics = {
+            "train/loss": loss,
+            "train/accuracy": acc,
+            "train/lr_effective": eff_lr,
+            "train/grad_norm": grad_norm,
+            "train/throughput": throughput,
+        }
         if step % 5 == 0:
-            for tag, val in gpu_stats().items():
-                report(tag, val, step)
-                log(writer, tag, val, step)
-            for tag, val in cpu_stats().items():
-                report(tag, val, step)
-                log(writer, tag, val, step)
-
-        print(
-            f"step {step:>4d} | loss={loss:.4f} | acc={acc:.4f} | "
-            f"base_lr={lr:.4f} | eff_lr={eff_lr:.4f}"
-        )
-        sys.stdout.flush()
-        time.sleep(SLEEP_PER_STEP)
+            metrics.update(gpu_stats())
+            metrics.update(cpu_stats())
+        _emit(step, metrics, writer)
+
+        next_t += SLEEP_PER_STEP
+        delay = next_t - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
 
+    stop_metric_worker(worker)
+    if _dropped_metrics:
+        print(f"[warn] dropped {_dropped_metrics} metric updates (queue full)")
     print("[info] training complete")
     if writer is not None:
         writer.flush()
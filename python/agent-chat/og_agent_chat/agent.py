@@ -3,13 +3,15 @@ from __future__ import annotations
 import asyncio
 import difflib
 import json
+import os
 import re
+import shutil
+import string
 import time
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, Iterable
-
-import unidiff
+from typing import Callable, Iterable, Iterator, Mapping, NamedTuple
 
 from .codebase import CodebaseIndex
 from .config import ensure_dspy_configured, get_dspy
@@ -61,6 +63,22 @@ Training script path:
 {training_path}
 """.strip()
 
+# The template is split into (literal, field) pairs once so each refactor
+# request only concatenates strings instead of re-parsing the format spec.
+_EDITOR_QUERY_SEGMENTS = tuple(
+    (literal, field_name)
+    for literal, field_name, _, _ in string.Formatter().parse(EDITOR_QUERY_TEMPLATE)
+)
+
+
+def _format_editor_query(**fields: object) -> str:
+    parts: list[str] = []
+    for literal, field_name in _EDITOR_QUERY_SEGMENTS:
+        parts.append(literal)
+        if field_name is not None:
+            parts.append(str(fields[field_name]))
+    return "".join(parts)
+
 
 @dataclass
 class AgentResponse:
@@ -68,6 +86,11 @@ class AgentResponse:
     plan: ActionPlan
 
 
+_DIFF_ASSIGNMENT = re.compile(
+    r"^([+-])[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.+?)[ \t\r]*$", re.MULTILINE
+)
+
+
 class ContextBuilder:
     def __init__(self, system_prompt: str = SYSTEM_PROMPT) -> None:
         self.system_prompt = system_prompt
@@ -90,60 +113,75 @@ class ContextBuilder:
                 message=alert.message,
             )
 
-        metrics_block = []
-        for metric_name, values in run_state.metrics.items():
-            tail = values[-20:]
-            metrics_block.append(f"{metric_name}: {tail}")
+        metrics_block = [
+            f"{metric_name}: {values[-20:].tolist()}" for metric_name, values in run_state.metrics.items()
+        ]
         metrics_text = "\n".join(metrics_block) if metrics_block else "No metrics yet."
 
         logs_text = run_state.log_tail(50) or "No logs yet."
 
-        training_text = ""
+        # Training text is mtime-cached on RunState, so this is a stat when unchanged.
         try:
-            training_text = run_state.training_file.read_text(encoding="utf-8")
+            training_text = run_state.training_text()
         except OSError:
             training_text = "<unable to read training file>"
 
-        codebase_listing = codebase_index.file_listing(limit=120)
-
-        return (
-            f"{self.system_prompt}\n\n"
-            f"ALERT:\n{alert_block}\n\n"
-            f"RECENT_METRICS:\n{metrics_text}\n\n"
-            f"LOG_TAIL:\n{logs_text}\n\n"
-            f"TRAINING_SCRIPT ({run_state.training_file}):\n{training_text}\n\n"
-            f"CODEBASE_FILES:\n{codebase_listing}\n"
-        )
+        parts = [
+            self.system_prompt,
+            "",
+            f"ALERT:\n{alert_block}",
+            "",
+            f"RECENT_METRICS:\n{metrics_text}",
+            "",
+            f"LOG_TAIL:\n{logs_text}",
+            "",
+            f"TRAINING_SCRIPT ({run_state.training_file}):\n{training_text}",
+            "",
+            f"CODEBASE_FILES:\n{codebase_index.default_listing}",
+            "",
+        ]
+        return "\n".join(parts)
 
 
 class ActionPlanner:
+    # The known labels may be indented or wrapped in markdown ("**ACTION:**",
+    # "## DIAGNOSIS:"); any other bare "LABEL:" line still ends a section.
+    # Decoration is not accepted for unknown labels so that context lines
+    # such as " # NOTE: ..." inside a diff do not cut CODE_CHANGES short.
+    _SECTION_HEADER = re.compile(
+        r"^[ \t*#]*(DIAGNOSIS|ACTION|CODE_CHANGES)[ \t*]*:\**|^([A-Z_]+)[ \t]*:",
+        re.MULTILINE,
+    )
+
     def parse_response(self, llm_output: str) -> ActionPlan:
-        diagnosis = self._extract_section(llm_output, "DIAGNOSIS")
-        action_raw = self._extract_section(llm_output, "ACTION").lower()
-        code_changes = self._extract_section(llm_output, "CODE_CHANGES")
+        spans = self._section_spans(llm_output)
 
-        action = "refactor" if "refactor" in action_raw else "explain"
-        if action == "explain":
-            code_changes = ""
+        def section(label: str) -> str:
+            span = spans.get(label)
+            return llm_output[span[0]:span[1]].strip() if span else ""
+
+        diagnosis = section("DIAGNOSIS")
+        action = "refactor" if "refactor" in section("ACTION").lower() else "explain"
+        # Explain plans never carry a diff, so the (often large) CODE_CHANGES
+        # body is only sliced out for refactors.
+        code_changes = section("CODE_CHANGES") if action == "refactor" else ""
 
         return ActionPlan(
             diagnosis=diagnosis or llm_output.strip(),
             action=action,
-            code_changes=code_changes.strip(),
+            code_changes=code_changes,
             raw_output=llm_output,
         )
 
-    @staticmethod
-    def _extract_section(text: str, label: str) -> str:
-        import re
-
-        pattern = re.compile(
-            rf"{label}\s*:\s*(.*?)(?=\n[A-Z_]+\s*:|$)", re.DOTALL
-        )
-        match = pattern.search(text)
-        if not match:
-            return ""
-        return match.group(1).strip()
+    @classmethod
+    def _section_spans(cls, text: str) -> dict[str, tuple[int, int]]:
+        """Locate ``LABEL: body`` sections in one pass; the first occurrence of a label wins."""
+        spans: dict[str, tuple[int, int]] = {}
+        headers = list(cls._SECTION_HEADER.finditer(text))
+        for index, match in enumerate(headers):
+            end = headers[index + 1].start() if index + 1 < len(headers) else len(text)
+            spans.setdefault(match.group(1) or match.group(2), (match.end(), end))
+        return spans
 
 
 class CodebaseExplorer:
@@ -157,7 +195,7 @@ class CodebaseExplorer:
         ensure_dspy_configured()
         dspy = get_dspy()
         self.codebase_index = codebase_index
-        self.context = codebase_index.build_context()
+        self.context = codebase_index.context_text
         self.rlm = dspy.RLM(
             "context, query -> answer",
             max_iterations=max_iterations,
@@ -198,6 +236,8 @@ class ToolCaller:
             tools=self._build_tools(),
             max_iters=max_iters,
         )
+        # Runs the module in dspy's async worker pool (async_max_workers).
+        self._react_async = dspy.asyncify(self.react)
 
     def _build_tools(self) -> list[Callable]:
         def alert_summary() -> str:
@@ -227,7 +267,7 @@ class ToolCaller:
         def read_training_file() -> str:
             """Read the training script content."""
             try:
-                return self.run_state.training_file.read_text(encoding="utf-8")
+                return self.run_state.training_text()
             except OSError:
                 return "<unable to read training file>"
 
@@ -259,6 +299,10 @@ class ToolCaller:
         prediction = self.react(context=context, question=question)
         return prediction.answer
 
+    async def arun(self, context: str, question: str) -> str:
+        prediction = await self._react_async(context=context, question=question)
+        return prediction.answer
+
 
 class CodeEditor:
     def __init__(
@@ -277,6 +321,7 @@ class CodeEditor:
             max_llm_calls=max_llm_calls,
             max_output_chars=max_output_chars,
         )
+        self._rlm_async = dspy.asyncify(self.rlm)
 
     def propose_diff(
         self,
@@ -284,6 +329,26 @@ class CodeEditor:
         diagnosis: str,
         alert: Alert | None = None,
     ) -> str:
+        context, query = self._build_inputs(run_state, diagnosis, alert)
+        result = self.rlm(context=context, query=query)
+        return result.answer
+
+    async def apropose_diff(
+        self,
+        run_state: RunState,
+        diagnosis: str,
+        alert: Alert | None = None,
+    ) -> str:
+        context, query = self._build_inputs(run_state, diagnosis, alert)
+        result = await self._rlm_async(context=context, query=query)
+        return result.answer
+
+    def _build_inputs(
+        self,
+        run_state: RunState,
+        diagnosis: str,
+        alert: Alert | None,
+    ) -> tuple[str, str]:
         alert_block = "No active alert."
         if alert:
             alert_block = (
@@ -297,21 +362,20 @@ class CodeEditor:
 
         training_text = ""
         try:
-            training_text = run_state.training_file.read_text(encoding="utf-8")
+            training_text = run_state.training_text()
         except OSError:
             training_text = "<unable to read training file>"
 
         context = (
             f"TRAINING_SCRIPT:\n{training_text}\n\n"
-            f"CODEBASE:\n{self.codebase_index.build_context()}"
+            f"CODEBASE:\n{self.codebase_index.context_text}"
         )
-        query = EDITOR_QUERY_TEMPLATE.format(
+        query = _format_editor_query(
             alert_block=alert_block,
             diagnosis=diagnosis,
             training_path=run_state.training_file,
         )
-        result = self.rlm(context=context, query=query)
-        return result.answer
+        return context, query
 
 
 class GuardedExecutor:
@@ -326,31 +390,31 @@ class GuardedExecutor:
         self.restart_callback = restart_callback
 
     async def execute(self, plan: ActionPlan, run_state: RunState) -> ExecutionResult:
-        checkpoint_id = create_checkpoint(run_state, self.checkpoint_dir)
+        # Only snapshot the training file when a patch is actually applied.
         if plan.action != "refactor":
-            return ExecutionResult(success=True, checkpoint_id=checkpoint_id)
+            return ExecutionResult(success=True)
         if not self.auto_mode:
-            return ExecutionResult(
-                success=False,
-                checkpoint_id=checkpoint_id,
-                error="Auto mode disabled.",
-            )
+            return ExecutionResult(success=False, error="Auto mode disabled.")
         if not plan.code_changes:
-            return ExecutionResult(
-                success=False,
-                checkpoint_id=checkpoint_id,
-                error="No code changes provided.",
-            )
+            return ExecutionResult(success=False, error="No code changes provided.")
 
+        # File I/O runs in worker threads so the event loop keeps serving clients.
+        # The metrics dict is copied here, on the loop, because add_metric may
+        # insert series while the worker thread iterates it.
+        checkpoint_id = await asyncio.to_thread(
+            create_checkpoint, run_state, self.checkpoint_dir, dict(run_state.metrics)
+        )
         try:
-            apply_diff(run_state.training_file, plan.code_changes)
+            await asyncio.to_thread(apply_diff, run_state.training_file, plan.code_changes)
             if self.restart_callback:
                 result = self.restart_callback(run_state)
                 if asyncio.iscoroutine(result):
                     await result
             return ExecutionResult(success=True, checkpoint_id=checkpoint_id)
         except Exception as exc:  # pragma: no cover - defensive guard
-            restore_checkpoint(checkpoint_id, run_state, self.checkpoint_dir)
+            await asyncio.to_thread(
+                restore_checkpoint, checkpoint_id, run_state, self.checkpoint_dir
+            )
             return ExecutionResult(
                 success=False,
                 checkpoint_id=checkpoint_id,
@@ -384,6 +448,12 @@ class AgentEngine:
             restart_callback=restart_callback,
         )
         self.chat_messages: list[ChatMessage] = []
+        # Concurrent first requests must not build the codebase index twice.
+        self._index_lock = asyncio.Lock()
+        # Auto-applied and approved plans each run checkpoint -> apply ->
+        # restart; interleaving two of them could restore a snapshot taken
+        # before the other's patch, so they take turns. LLM calls stay outside.
+        self._execution_lock = asyncio.Lock()
 
     def _ensure_model_stack(self) -> None:
         if self.codebase_index is None:
@@ -435,7 +505,7 @@ class AgentEngine:
                 return None
 
         try:
-            original = self.run_state.training_file.read_text(encoding="utf-8")
+            original = self.run_state.training_text()
         except OSError as exc:
             diagnosis = f"Unable to read training file: {exc}"
             raw = f"DIAGNOSIS: {diagnosis}\nACTION: explain\nCODE_CHANGES:"
@@ -555,6 +625,17 @@ class AgentEngine:
             raw = plan.raw_output
         else:
             try:
+                # Index building blocks for seconds; build it in a worker thread so
+                # the daemon keeps serving metrics. The dspy modules (and any
+                # dspy.configure) stay on the loop thread, since dspy only lets
+                # the thread that first configured it change settings. LLM calls
+                # use dspy's async pool. Context assembly stays on the loop since
+                # it iterates run_state.
+                async with self._index_lock:
+                    if self.codebase_index is None:
+                        self.codebase_index = await asyncio.to_thread(
+                            CodebaseIndex.from_root, self.codebase_root
+                        )
                 self._ensure_model_stack()
                 assert self.codebase_index is not None
                 assert self.tool_caller is not None
@@ -564,10 +645,10 @@ class AgentEngine:
                     self.codebase_index,
                     alert=alert,
                 )
-                raw = self.tool_caller.run(context=context, question=question)
+                raw = await self.tool_caller.arun(context=context, question=question)
                 plan = self.action_planner.parse_response(raw)
                 if plan.action == "refactor" and not plan.code_changes:
-                    diff = self.editor.propose_diff(
+                    diff = await self.editor.apropose_diff(
                         self.run_state,
                         plan.diagnosis,
                         alert=alert,
@@ -596,7 +677,8 @@ class AgentEngine:
             if summary:
                 self.add_chat_message("system", summary)
         if plan.action == "refactor" and self.executor.auto_mode:
-            result = await self.executor.execute(plan, self.run_state)
+            async with self._execution_lock:
+                result = await self.executor.execute(plan, self.run_state)
             if result.success:
                 self.add_chat_message(
                     "system",
@@ -611,23 +693,15 @@ class AgentEngine:
 
     @staticmethod
     def _summarize_diff_changes(diff_text: str) -> str:
-        assignment_re = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.+?)\s*$")
         removed: dict[str, str] = {}
         added: dict[str, str] = {}
 
-        for raw_line in diff_text.splitlines():
-            if raw_line.startswith("---") or raw_line.startswith("+++") or raw_line.startswith("@@"):
-                continue
-            if raw_line.startswith("-"):
-                line = raw_line[1:]
-                m = assignment_re.match(line)
-                if m:
-                    removed[m.group(1)] = m.group(2)
-            elif raw_line.startswith("+"):
-                line = raw_line[1:]
-                m = assignment_re.match(line)
-                if m:
-                    added[m.group(1)] = m.group(2)
+        # "---"/"+++" file headers never match: the sign must be followed by an identifier.
+        for sign, key, value in _DIFF_ASSIGNMENT.findall(diff_text):
+            if sign == "-":
+                removed[key] = value
+            else:
+                added[key] = value
 
         changes: list[str] = []
         for key in sorted(set(removed.keys()) | set(added.keys())):
@@ -650,9 +724,16 @@ class AgentEngine:
         """Execute a refactor plan (called from TUI approve, bypasses auto_mode)."""
         if plan.action != "refactor" or not plan.code_changes:
             return ExecutionResult(success=False, error="No refactor to apply.")
-        checkpoint_id = create_checkpoint(self.run_state, self.executor.checkpoint_dir)
+        async with self._execution_lock:
+            return await self._execute_plan_locked(plan)
+
+    async def _execute_plan_locked(self, plan: ActionPlan) -> ExecutionResult:
+        checkpoint_dir = self.executor.checkpoint_dir
+        checkpoint_id = await asyncio.to_thread(
+            create_checkpoint, self.run_state, checkpoint_dir, dict(self.run_state.metrics)
+        )
         try:
-            apply_diff(self.run_state.training_file, plan.code_changes)
+            await asyncio.to_thread(apply_diff, self.run_state.training_file, plan.code_changes)
             if self.executor.restart_callback:
                 result = self.executor.restart_callback(self.run_state)
                 if asyncio.iscoroutine(result):
@@ -663,7 +744,9 @@ class AgentEngine:
             )
             return ExecutionResult(success=True, checkpoint_id=checkpoint_id)
         except Exception as exc:
-            restore_checkpoint(checkpoint_id, self.run_state, self.executor.checkpoint_dir)
+            await asyncio.to_thread(
+                restore_checkpoint, checkpoint_id, self.run_state, checkpoint_dir
+            )
             self.add_chat_message(
                 "system",
                 f"Refactor failed: {exc}. Rolled back.",
@@ -693,41 +776,72 @@ async def agent_loop(
         await asyncio.sleep(poll_interval)
 
 
-def create_checkpoint(run_state: RunState, checkpoint_dir: Path) -> str:
-    checkpoint_id = f"ckpt_{int(time.time())}"
-    ckpt_path = checkpoint_dir / checkpoint_id
-    ckpt_path.mkdir(parents=True, exist_ok=True)
+def create_checkpoint(
+    run_state: RunState,
+    checkpoint_dir: Path,
+    metrics: Mapping[str, array[float]] | None = None,
+) -> str:
+    """Snapshot the training file and metrics.
+
+    Callers running this off the event loop pass ``metrics`` as a copy of
+    ``run_state.metrics`` taken on the loop.
+    """
+    if metrics is None:
+        metrics = run_state.metrics
+    checkpoint_id, ckpt_path = _make_checkpoint_path(checkpoint_dir, f"ckpt_{int(time.time())}")
     training_dest = ckpt_path / run_state.training_file.name
-    training_dest.write_text(
-        run_state.training_file.read_text(encoding="utf-8"), encoding="utf-8"
-    )
+    shutil.copyfile(run_state.training_file, training_dest)
     state_path = ckpt_path / "state.json"
     state_payload = {
-        "metrics": run_state.metrics,
+        "metrics": {name: values.tolist() for name, values in metrics.items()},
         "step": run_state.current_step,
     }
-    state_path.write_text(json.dumps(state_payload, indent=2), encoding="utf-8")
+    # json.dumps escapes non-ASCII by default, so the payload encodes as-is.
+    state_path.write_bytes(json.dumps(state_payload, separators=(",", ":")).encode("ascii"))
     return checkpoint_id
 
 
+def _make_checkpoint_path(checkpoint_dir: Path, base_id: str) -> tuple[str, Path]:
+    """Create a fresh checkpoint directory, suffixing the id if it is taken.
+
+    A single mkdir is enough once the base directory exists; checkpoints taken
+    within the same second get ``_1``, ``_2``, ... instead of sharing a dir.
+    """
+    checkpoint_id = base_id
+    attempt = 0
+    while True:
+        ckpt_path = checkpoint_dir / checkpoint_id
+        try:
+            os.mkdir(ckpt_path)
+            return checkpoint_id, ckpt_path
+        except FileNotFoundError:
+            checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        except FileExistsError:
+            attempt += 1
+            checkpoint_id = f"{base_id}_{attempt}"
+
+
 def restore_checkpoint(checkpoint_id: str, run_state: RunState, checkpoint_dir: Path) -> None:
     ckpt_path = checkpoint_dir / checkpoint_id
     training_source = ckpt_path / run_state.training_file.name
-    run_state.training_file.write_text(
-        training_source.read_text(encoding="utf-8"), encoding="utf-8"
-    )
+    tmp_path = run_state.training_file.with_suffix(run_state.training_file.suffix + ".tmp")
+    shutil.copyfile(training_source, tmp_path)
+    if run_state.training_file.exists():
+        shutil.copymode(run_state.training_file, tmp_path)
+    tmp_path.replace(run_state.training_file)
 
 
 def apply_diff(filepath: Path, diff_text: str) -> None:
     normalized_diff = _normalize_diff_text(diff_text)
-    patch = unidiff.PatchSet(normalized_diff)
+    patch = _parse_diff(normalized_diff)
     if not patch:
         raise ValueError("Empty diff provided.")
 
+    acceptable = _acceptable_patch_paths(filepath)
     target_patches = [
         patch_file
         for patch_file in patch
-        if _patch_file_targets_filepath(filepath, patch_file)
+        if _patch_file_targets_filepath(filepath, patch_file, acceptable)
     ]
     if not target_patches:
         raise ValueError("Diff does not target the training file.")
@@ -737,10 +851,19 @@ def apply_diff(filepath: Path, diff_text: str) -> None:
     patch_file = target_patches[0]
 
     original_lines = filepath.read_text(encoding="utf-8").splitlines(keepends=True)
-    updated_lines = _apply_patch_hunks(original_lines, patch_file)
 
     tmp_path = filepath.with_suffix(filepath.suffix + ".tmp")
-    tmp_path.write_text("".join(updated_lines), encoding="utf-8")
+    # Patched lines are streamed straight into the temp file; a hunk that fails
+    # validation aborts the write and leaves the original untouched. The data
+    # is fsynced before the rename so a crash cannot leave a truncated file.
+    try:
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            handle.writelines(_apply_patch_hunks(original_lines, patch_file))
+            handle.flush()
+            os.fsync(handle.fileno())
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
     tmp_path.replace(filepath)
 
 
@@ -786,64 +909,167 @@ def _normalize_patch_path(patch_path: str | None) -> str:
 
 def _patch_file_targets_filepath(
     filepath: Path,
-    patch_file: unidiff.PatchedFile,
+    patch_file: _FilePatch,
+    acceptable: frozenset[str] | None = None,
 ) -> bool:
-    for patch_path in [patch_file.path, patch_file.source_file, patch_file.target_file]:
-        if _patch_targets_file(filepath, patch_path):
+    if acceptable is None:
+        acceptable = _acceptable_patch_paths(filepath)
+    for patch_path in [patch_file.source_file, patch_file.target_file]:
+        if _patch_targets_file(filepath, patch_path, acceptable):
             return True
     return False
 
 
-def _patch_targets_file(filepath: Path, patch_path: str | None) -> bool:
+def _acceptable_patch_paths(filepath: Path) -> frozenset[str]:
+    """Every normalized patch path that refers to ``filepath``.
+
+    Besides the name and the full relative/resolved paths, every trailing
+    ``/``-separated suffix of those paths is accepted, so a single set lookup
+    replaces the equality and ``endswith`` checks.
+    """
+    forms = {filepath.name}
+    for path in (filepath.as_posix(), filepath.resolve().as_posix()):
+        path = path.replace("\\", "/")
+        forms.add(path)
+        parts = path.split("/")
+        forms.update("/".join(parts[index:]) for index in range(1, len(parts)))
+    forms.discard("")
+    return frozenset(forms)
+
+
+def _patch_targets_file(
+    filepath: Path,
+    patch_path: str | None,
+    acceptable: frozenset[str] | None = None,
+) -> bool:
     normalized = _normalize_patch_path(patch_path)
     if not normalized:
         return False
+    if acceptable is None:
+        acceptable = _acceptable_patch_paths(filepath)
+    return normalized in acceptable
 
-    file_path = filepath.as_posix().replace("\\", "/")
-    resolved_path = filepath.resolve().as_posix().replace("\\", "/")
 
-    if normalized == filepath.name:
-        return True
-    if normalized == file_path or normalized == resolved_path:
-        return True
-    if file_path.endswith("/" + normalized):
-        return True
-    if resolved_path.endswith("/" + normalized):
-        return True
+_LINE_ADDED = "+"
+_LINE_REMOVED = "-"
+_LINE_CONTEXT = " "
+_NO_NEWLINE_MARKER = "\\"
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
 
-    return False
 
+class _Hunk(NamedTuple):
+    source_start: int
+    source_length: int
+    ops: list[tuple[str, str]]
 
-def _apply_patch_hunks(original_lines: list[str], patch_file: unidiff.PatchedFile) -> list[str]:
-    result: list[str] = []
+
+@dataclass
+class _FilePatch:
+    source_file: str
+    target_file: str
+    hunks: list[_Hunk] = field(default_factory=list)
+
+
+def _parse_diff(diff_text: str) -> list[_FilePatch]:
+    """Parse a unified diff into per-file hunks of ``(line_type, value)`` ops.
+
+    Only what apply_diff needs is kept: file headers, hunk ranges and the
+    hunk bodies. Git extended headers and other preamble lines are skipped.
+    """
+    files: list[_FilePatch] = []
+    current: _FilePatch | None = None
+    source_file: str | None = None
+    lines = diff_text.splitlines(keepends=True)
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        if line.startswith("--- "):
+            source_file = _strip_header_path(line[4:])
+            current = None
+            continue
+        if line.startswith("+++ ") and source_file is not None:
+            current = _FilePatch(source_file, _strip_header_path(line[4:]))
+            files.append(current)
+            source_file = None
+            continue
+        header = _HUNK_HEADER.match(line)
+        if header is None:
+            continue
+        if current is None:
+            raise ValueError(f"Unexpected hunk found: {line.rstrip()}")
+
+        source_length = int(header.group(2) or 1)
+        source_left = source_length
+        target_left = int(header.group(4) or 1)
+        ops: list[tuple[str, str]] = []
+        while source_left > 0 or target_left > 0:
+            if index >= len(lines):
+                raise ValueError("Hunk is shorter than expected.")
+            body = lines[index]
+            index += 1
+            if body[0] in "\r\n":
+                # A bare newline is an empty context line with its marker stripped.
+                tag, value = _LINE_CONTEXT, body
+            else:
+                tag, value = body[0], body[1:]
+            if tag == _LINE_CONTEXT:
+                source_left -= 1
+                target_left -= 1
+            elif tag == _LINE_REMOVED:
+                source_left -= 1
+            elif tag == _LINE_ADDED:
+                target_left -= 1
+            elif tag == _NO_NEWLINE_MARKER:
+                continue
+            else:
+                raise ValueError(f"Hunk diff line expected: {body.rstrip()}")
+            if source_left < 0 or target_left < 0:
+                raise ValueError("Hunk is longer than expected.")
+            ops.append((tag, value))
+        current.hunks.append(_Hunk(int(header.group(1)), source_length, ops))
+    return files
+
+
+def _strip_header_path(header: str) -> str:
+    # "--- a/train.py\t2026-03-01 10:00" -> "a/train.py"
+    return header.rstrip("\r\n").split("\t", 1)[0]
+
+
+def _apply_patch_hunks(original_lines: list[str], patch_file: _FilePatch) -> Iterator[str]:
+    """Yield the patched file's lines, validating each hunk before emitting it."""
     src_index = 0
 
-    for hunk in patch_file:
+    for hunk in patch_file.hunks:
         hunk_start = max(hunk.source_start - 1, 0)
         if hunk_start < src_index:
             raise ValueError("Overlapping hunks detected.")
 
-        result.extend(original_lines[src_index:hunk_start])
-        src_index = hunk_start
-
-        for line in hunk:
-            if line.is_context:
-                if src_index >= len(original_lines):
-                    raise ValueError("Patch context exceeds file length.")
-                original = original_lines[src_index]
-                if original.rstrip("\n") != line.value.rstrip("\n"):
+        yield from original_lines[src_index:hunk_start]
+
+        ops = hunk.ops
+        expected = [value for tag, value in ops if tag != _LINE_ADDED]
+        hunk_end = hunk_start + len(expected)
+        if hunk_end > len(original_lines):
+            raise ValueError("Patch context exceeds file length.")
+        source = original_lines[hunk_start:hunk_end]
+        # Exact list equality covers the common case; the newline-tolerant
+        # comparison only runs on lines that differ.
+        if source == expected:
+            yield from (value for tag, value in ops if tag != _LINE_REMOVED)
+        else:
+            for original, wanted in zip(source, expected):
+                if original != wanted and original.rstrip("\n") != wanted.rstrip("\n"):
                     raise ValueError("Patch context does not match file.")
-                result.append(original)
-                src_index += 1
-            elif line.is_removed:
-                if src_index >= len(original_lines):
-                    raise ValueError("Patch removal exceeds file length.")
-                original = original_lines[src_index]
-                if original.rstrip("\n") != line.value.rstrip("\n"):
-                    raise ValueError("Patch removal does not match file.")
-                src_index += 1
-            elif line.is_added:
-                result.append(line.value)
-
-    result.extend(original_lines[src_index:])
-    return result
+            # Keep the file's own text for context lines.
+            source_iter = iter(source)
+            for tag, value in ops:
+                if tag == _LINE_ADDED:
+                    yield value
+                elif tag == _LINE_CONTEXT:
+                    yield next(source_iter)
+                else:
+                    next(source_iter)
+        src_index = hunk_end
+
+    yield from original_lines[src_index:]
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
 import json
+import operator
 import os
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Literal, Sequence
+from typing import Callable, Literal, Sequence
 
 from .models import Alert, RunState
 
 Comparison = Literal["gt", "gte", "lt", "lte"]
 Direction = Literal["decrease", "increase"]
 
+_COMPARATORS: dict[str, Callable[[float, float], bool]] = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+def _never(current: float, threshold: float) -> bool:
+    return False
+
 
 @dataclass
 class ThresholdRule:
@@ -20,20 +32,18 @@ class ThresholdRule:
     comparison: Comparison = "gt"
     cooldown_secs: float = 60.0
     message: str | None = None
+    _cmp: Callable[[float, float], bool] = field(
+        default=_never, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        # Resolve the comparison once instead of string-matching on every poll.
+        self._cmp = _COMPARATORS.get(self.comparison, _never)
 
     def evaluate(self, values: Sequence[float]) -> bool:
         if not values:
             return False
-        current = values[-1]
-        if self.comparison == "gt":
-            return current > self.threshold
-        if self.comparison == "gte":
-            return current >= self.threshold
-        if self.comparison == "lt":
-            return current < self.threshold
-        if self.comparison == "lte":
-            return current <= self.threshold
-        return False
+        return self._cmp(values[-1], self.threshold)
 
     def to_alert(self, current: float) -> Alert:
         return Alert(
@@ -53,15 +63,16 @@ class StallRule:
     direction: Direction = "decrease"
     cooldown_secs: float = 60.0
     message: str | None = None
+    _sign: float = field(default=1.0, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Improvement is start - end for "decrease" and end - start otherwise.
+        self._sign = 1.0 if self.direction == "decrease" else -1.0
 
     def evaluate(self, values: Sequence[float]) -> bool:
         if len(values) < self.window:
             return False
-        start = values[-self.window]
-        end = values[-1]
-        if self.direction == "decrease":
-            return (start - end) < self.min_delta
-        return (end - start) < self.min_delta
+        return (values[-self.window] - values[-1]) * self._sign < self.min_delta
 
     def to_alert(self, current: float) -> Alert:
         return Alert(
@@ -79,17 +90,23 @@ AlertRule = ThresholdRule | StallRule
 
 class AlertDetector:
     def __init__(self, rules: Sequence[AlertRule] | None = None) -> None:
-        self.rules = list(rules or [])
         self.last_triggered: dict[str, float] = {}
+        self.set_rules(rules or [])
 
     def set_rules(self, rules: Sequence[AlertRule]) -> None:
         self.rules = list(rules)
+        # Metric updates arrive one metric at a time, so index rules by metric
+        # to avoid scanning every registered rule on each update.
+        self._rules_by_metric: dict[str, list[AlertRule]] = {}
+        for rule in self.rules:
+            self._rules_by_metric.setdefault(rule.metric, []).append(rule)
 
     def check(self, run_state: RunState, metric: str | None = None) -> Alert | None:
+        rules = self._rules_by_metric.get(metric, ()) if metric else self.rules
+        if not rules:
+            return None
         now = time.time()
-        for rule in self.rules:
-            if metric and rule.metric != metric:
-                continue
+        for rule in rules:
             last = self.last_triggered.get(rule.metric, 0.0)
             if now - last < rule.cooldown_secs:
                 continue
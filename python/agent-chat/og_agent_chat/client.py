@@ -1,11 +1,20 @@
 from __future__ import annotations
 
+import contextlib
 import json
+import math
 import os
 import socket
+import threading
 from pathlib import Path
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
 def _default_socket_path() -> str:
     tmpdir = os.getenv("TMPDIR") or os.getenv("TEMP") or os.getenv("TMP") or "/tmp"
     return str(Path(tmpdir) / "opengraphs-ogd.sock")
@@ -18,37 +27,206 @@ class OGDClientError(RuntimeError):
     pass
 
 
-def _recv_line(sock: socket.socket) -> bytes:
-    buffer = bytearray()
-    while True:
-        chunk = sock.recv(4096)
-        if not chunk:
-            break
-        buffer.extend(chunk)
-        if b"\n" in chunk:
-            break
-    if b"\n" in buffer:
-        line, _ = buffer.split(b"\n", 1)
-        return bytes(line)
-    return bytes(buffer)
-
-
-def send_request(payload: dict[str, Any], socket_path: str | Path = DEFAULT_SOCKET) -> dict[str, Any]:
-    path = Path(socket_path)
-    if not path.exists():
-        raise OGDClientError(f"Socket not found: {path}")
-
-    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
-        sock.connect(str(path))
-        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
-        data = _recv_line(sock)
-
-    if not data:
-        raise OGDClientError("No response from daemon")
+def _is_finite(value: Any) -> bool:
+    if isinstance(value, dict):
+        return all(map(_is_finite, value.values()))
+    if isinstance(value, (list, tuple)):
+        return all(map(_is_finite, value))
+    if value is None or isinstance(value, str):
+        return True
+    tolist = getattr(value, "tolist", None)
+    if tolist is not None:
+        # numpy scalars/arrays and array.array.
+        return _is_finite(tolist())
     try:
-        return json.loads(data.decode("utf-8"))
-    except json.JSONDecodeError as exc:  # pragma: no cover
-        raise OGDClientError("Invalid response from daemon") from exc
+        return math.isfinite(value)
+    except (TypeError, OverflowError):
+        return True
+
+
+def _json_default(value: Any) -> Any:
+    # The stdlib fallback must accept the numpy values orjson did.
+    tolist = getattr(value, "tolist", None)
+    if tolist is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return tolist()
+
+
+def _encode(payload: dict[str, Any]) -> bytes:
+    # orjson writes NaN/Inf as null, which the daemon rejects as a missing
+    # value, so payloads holding them go through the stdlib encoder, which
+    # keeps them as NaN/Infinity like the daemon's own json.
+    if orjson is not None and _is_finite(payload):
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass
+    return json.dumps(payload, default=_json_default).encode("utf-8")
+
+
+def _decode(data: bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # The daemon's stdlib json may emit NaN/Infinity, which orjson rejects.
+            pass
+    return json.loads(data)
+
+
+_RECV_CHUNK = 65536
+# Large enough that a full context or chat payload fits in one kernel copy.
+_SOCKET_BUFFER_BYTES = 1 << 20
+_local = threading.local()
+
+
+def _recv_buffer() -> memoryview:
+    # One receive buffer per thread, reused across requests.
+    view = getattr(_local, "recv_view", None)
+    if view is None:
+        view = _local.recv_view = memoryview(bytearray(_RECV_CHUNK))
+    return view
+
+
+def _send_all(sock: socket.socket, buffers: list[bytes]) -> None:
+    """Send buffers with scatter-gather sendmsg, without joining them first."""
+    views = [memoryview(buffer) for buffer in buffers]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent:
+            views[0] = views[0][sent:]
+
+
+class OGDConnection:
+    """A daemon connection that stays open across requests.
+
+    The daemon serves newline-delimited requests on a connection until the
+    client hangs up, so one socket can carry any number of round trips.
+    """
+
+    def __init__(self, socket_path: str | Path = DEFAULT_SOCKET) -> None:
+        self.socket_path = Path(socket_path)
+        self._sock: socket.socket | None = None
+        self._pid: int | None = None
+        self._pending = bytearray()
+
+    def __enter__(self) -> OGDConnection:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+                # Best effort: the kernel may clamp or refuse the size.
+                with contextlib.suppress(OSError):
+                    sock.setsockopt(socket.SOL_SOCKET, option, _SOCKET_BUFFER_BYTES)
+            # connect() resolves the path itself; no separate exists() stat.
+            sock.connect(str(self.socket_path))
+        except FileNotFoundError:
+            sock.close()
+            raise OGDClientError(f"Socket not found: {self.socket_path}") from None
+        except BaseException:
+            sock.close()
+            raise
+        self._sock = sock
+        self._pid = os.getpid()
+        self._pending.clear()
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._pending.clear()
+
+    def request(self, payload: dict[str, Any]) -> dict[str, Any]:
+        data = _encode(payload)
+        if self._sock is not None and self._pid != os.getpid():
+            # Inherited across fork(): the parent still reads replies from
+            # this stream, so the child opens its own.
+            self.close()
+        reused = self._sock is not None
+        if not reused:
+            self.connect()
+        try:
+            line = self._round_trip(data, resend=reused)
+        except BaseException:
+            # Never leave a half-read reply behind for the next request.
+            self.close()
+            raise
+
+        if not line:
+            raise OGDClientError("No response from daemon")
+        try:
+            return _decode(line)
+        except json.JSONDecodeError as exc:  # pragma: no cover - orjson's error subclasses it
+            raise OGDClientError("Invalid response from daemon") from exc
+
+    def _round_trip(self, data: bytes, resend: bool) -> bytes:
+        assert self._sock is not None
+        try:
+            _send_all(self._sock, [data, b"\n"])
+        except ConnectionError:
+            if not resend:
+                raise OGDClientError("No response from daemon") from None
+            # The daemon restarted or dropped this idle connection before the
+            # request went out, so it is safe to send it once more on a fresh
+            # socket.
+            self.close()
+            self.connect()
+            return self._round_trip(data, resend=False)
+        try:
+            return self._read_line()
+        except (EOFError, ConnectionError):
+            # The daemon may already have acted on the request; do not replay it.
+            raise OGDClientError("No response from daemon") from None
+
+    def _read_line(self) -> bytes:
+        assert self._sock is not None
+        pending = self._pending
+        view = _recv_buffer()
+        # Only bytes appended since the last scan can hold the newline, so a
+        # large response is scanned once rather than once per chunk.
+        newline = pending.find(b"\n")
+        while newline < 0:
+            received = self._sock.recv_into(view)
+            if not received:
+                raise EOFError
+            newline = view.obj.find(b"\n", 0, received)
+            if newline >= 0:
+                newline += len(pending)
+            pending += view[:received]
+        line = bytes(pending[:newline])
+        del pending[: newline + 1]
+        return line
+
+
+def _thread_connection(socket_path: str | Path) -> OGDConnection:
+    # One cached connection per thread and socket path.
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = str(socket_path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = OGDConnection(socket_path)
+    return conn
+
+
+def send_request(
+    payload: dict[str, Any],
+    socket_path: str | Path = DEFAULT_SOCKET,
+    *,
+    conn: OGDConnection | None = None,
+) -> dict[str, Any]:
+    if conn is None:
+        conn = _thread_connection(socket_path)
+    return conn.request(payload)
 
 
 def ping(socket_path: str | Path = DEFAULT_SOCKET) -> dict[str, Any]:
@@ -76,6 +254,18 @@ def send_metric(
     return send_request(payload, socket_path)
 
 
+def send_metrics(
+    metrics: dict[str, float],
+    *,
+    step: int | None = None,
+    socket_path: str | Path = DEFAULT_SOCKET,
+) -> dict[str, Any]:
+    payload: dict[str, Any] = {"type": "metrics_batch", "metrics": dict(metrics)}
+    if step is not None:
+        payload["step"] = step
+    return send_request(payload, socket_path)
+
+
 def append_log(line: str, socket_path: str | Path = DEFAULT_SOCKET) -> dict[str, Any]:
     return send_request({"type": "log_append", "line": line}, socket_path)
 
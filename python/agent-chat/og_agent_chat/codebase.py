@@ -1,36 +1,76 @@
 from __future__ import annotations
 
+import os
+import re
 from dataclasses import dataclass
+from functools import cached_property, lru_cache
 from pathlib import Path
-from typing import Iterable
-
-DEFAULT_EXTENSIONS = {
-    ".py",
-    ".rs",
-    ".ts",
-    ".tsx",
-    ".js",
-    ".md",
-    ".toml",
-    ".yaml",
-    ".yml",
-    ".json",
-}
-DEFAULT_IGNORE_DIRS = {
-    ".git",
-    ".venv",
-    "__pycache__",
-    "node_modules",
-    "dist",
-    "build",
-    "target",
-}
+from typing import Iterable, Iterator
+
+DEFAULT_EXTENSIONS = frozenset(
+    {
+        ".py",
+        ".rs",
+        ".ts",
+        ".tsx",
+        ".js",
+        ".md",
+        ".toml",
+        ".yaml",
+        ".yml",
+        ".json",
+    }
+)
+DEFAULT_IGNORE_DIRS = frozenset(
+    {
+        ".git",
+        ".venv",
+        "__pycache__",
+        "node_modules",
+        "dist",
+        "build",
+        "target",
+    }
+)
+DEFAULT_LISTING_LIMIT = 120
+# A NUL byte this early means the file is binary, whatever its extension.
+BINARY_SNIFF_BYTES = 4096
+
+
+@lru_cache(maxsize=256)
+def _compile_search_pattern(pattern: str) -> re.Pattern[str]:
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _walk_files(root: Path, ignore_dirs: frozenset[str]) -> Iterator[os.DirEntry[str]]:
+    """Yield file entries under ``root`` without entering ignored directories.
+
+    Like ``Path.rglob``, symlinked directories are not followed.
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as scandir_it:
+                entries = list(scandir_it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ignore_dirs:
+                        stack.append(entry.path)
+                    continue
+                if entry.is_file():
+                    yield entry
+            except OSError:
+                continue
 
 
 @dataclass
 class CodebaseDocument:
     path: Path
     content: str
+    rel_path: str
 
 
 @dataclass
@@ -49,66 +89,101 @@ class CodebaseIndex:
         max_total_chars: int = 300000,
         ignore_dirs: Iterable[str] | None = None,
     ) -> "CodebaseIndex":
-        ext_set = set(extensions or DEFAULT_EXTENSIONS)
-        ignore_set = set(ignore_dirs or DEFAULT_IGNORE_DIRS)
+        ext_set = frozenset(extensions) if extensions else DEFAULT_EXTENSIONS
+        ignore_set = frozenset(ignore_dirs) if ignore_dirs else DEFAULT_IGNORE_DIRS
         documents: list[CodebaseDocument] = []
         truncated: list[Path] = []
         total_chars = 0
+        # Entry paths all start with the root, so relative paths are a slice.
+        root_prefix_len = len(os.path.join(os.fspath(root), ""))
+        max_byte_count = 4 * (max_file_chars + 1)
 
-        for path in root.rglob("*"):
+        for entry in _walk_files(root, ignore_set):
             if len(documents) >= max_files:
                 break
-            if not path.is_file():
-                continue
-            if any(part in ignore_set for part in path.parts):
-                continue
-            if path.suffix and path.suffix not in ext_set:
+            suffix = os.path.splitext(entry.name)[1]
+            if suffix and suffix not in ext_set:
                 continue
 
+            path = Path(entry.path)
             try:
-                text = path.read_text(encoding="utf-8", errors="ignore")
+                # A file of n bytes decodes to at least n / 4 chars. When even
+                # that cannot fit the remaining budget, only the binary sniff
+                # is read before stopping.
+                min_chars = min(-(-entry.stat().st_size // 4), max_file_chars)
+                fits = total_chars + min_chars <= max_total_chars
+                with open(entry.path, "rb") as handle:
+                    # UTF-8 needs at most 4 bytes per char, so this is enough
+                    # to tell whether the file runs past max_file_chars.
+                    data = handle.read(max_byte_count + 1 if fits else BINARY_SNIFF_BYTES)
             except OSError:
                 continue
+            if data.find(b"\0", 0, BINARY_SNIFF_BYTES) >= 0:
+                continue
+            if not fits:
+                break
 
-            if len(text) > max_file_chars:
+            # Match read_text's universal newlines so "$" anchors and the LLM
+            # context never see a stray "\r".
+            text = data[:max_byte_count].decode("utf-8", errors="ignore")
+            if "\r" in text:
+                text = text.replace("\r\n", "\n").replace("\r", "\n")
+            if len(data) > max_byte_count or len(text) > max_file_chars:
                 text = text[:max_file_chars] + "\n... (truncated)\n"
                 truncated.append(path)
             if total_chars + len(text) > max_total_chars:
                 break
             total_chars += len(text)
-            documents.append(CodebaseDocument(path=path, content=text))
+            documents.append(
+                CodebaseDocument(path=path, content=text, rel_path=entry.path[root_prefix_len:])
+            )
 
         return cls(root=root, documents=documents, truncated=truncated)
 
+    @cached_property
+    def context_text(self) -> str:
+        """Full codebase context, rendered once per index."""
+        return self.build_context()
+
+    @cached_property
+    def default_listing(self) -> str:
+        """File listing used in agent context, rendered once per index."""
+        return self.file_listing(limit=DEFAULT_LISTING_LIMIT)
+
+    def refresh(self) -> None:
+        """Drop cached renderings after ``documents`` or ``truncated`` change."""
+        self.__dict__.pop("context_text", None)
+        self.__dict__.pop("default_listing", None)
+
     def file_listing(self, limit: int = 100) -> str:
-        items = [str(doc.path.relative_to(self.root)) for doc in self.documents[:limit]]
+        items = [doc.rel_path for doc in self.documents[:limit]]
         if len(self.documents) > limit:
             items.append("... (more files omitted)")
         return "\n".join(items)
 
     def build_context(self) -> str:
+        # Collect the pieces flat and join once, so each document's content is
+        # copied only into the final string rather than into a per-file
+        # f-string first.
         parts: list[str] = []
         for doc in self.documents:
-            rel_path = doc.path.relative_to(self.root)
-            parts.append(f"FILE: {rel_path}\n{doc.content}")
+            parts += ("FILE: ", doc.rel_path, "\n", doc.content, "\n\n")
         if self.truncated:
-            truncated_list = "\n".join(
-                str(path.relative_to(self.root)) for path in self.truncated
-            )
-            parts.append("TRUNCATED_FILES:\n" + truncated_list)
-        return "\n\n".join(parts)
+            parts.append("TRUNCATED_FILES:")
+            for path in self.truncated:
+                parts += ("\n", str(path.relative_to(self.root)))
+        elif parts:
+            parts.pop()
+        return "".join(parts)
 
     def search_regex(self, pattern: str, max_matches: int = 20) -> list[str]:
-        import re
-
         results: list[str] = []
-        regex = re.compile(pattern, re.IGNORECASE)
+        search = _compile_search_pattern(pattern).search
         for doc in self.documents:
-            lines = doc.content.splitlines()
-            for idx, line in enumerate(lines, start=1):
-                if regex.search(line):
-                    rel_path = doc.path.relative_to(self.root)
-                    results.append(f"{rel_path}:{idx}: {line.strip()}")
+            # Match line by line so \s and negated classes cannot span lines.
+            for idx, line in enumerate(doc.content.splitlines(), start=1):
+                if search(line):
+                    results.append(f"{doc.rel_path}:{idx}: {line.strip()}")
                     if len(results) >= max_matches:
                         return results
         return results
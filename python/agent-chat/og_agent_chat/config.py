@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, NamedTuple, Optional
 
 
 def _ensure_deno_dir() -> None:
@@ -13,8 +13,10 @@ def _ensure_deno_dir() -> None:
 
 
 _DEFAULT_MODEL = "openai/gpt-5.2-codex"
+_DEFAULT_ASYNC_MAX_WORKERS = 16
 _VALID_INFERENCE_PROVIDERS = {"auto", "openai"}
 _configured_lm: Optional[Any] = None
+_configured_settings: Optional[_LMSettings] = None
 _dspy_module: Any | None = None
 
 
@@ -28,31 +30,50 @@ def get_dspy() -> Any:
     return _dspy_module
 
 
+# Line breaks are dropped anywhere in a key; whitespace and quotes only at the
+# ends.
+_API_KEY_DELETE = str.maketrans("", "", "\r\n")
+_API_KEY_STRIP = " \t\f\v\"'"
+
+
 def _sanitize_api_key(value: str | None) -> str | None:
     if value is None:
         return None
-    cleaned = value.strip().strip('"').strip("'")
-    if cleaned.lower().startswith("bearer "):
+    cleaned = value.translate(_API_KEY_DELETE).strip(_API_KEY_STRIP)
+    if cleaned[:7].lower() == "bearer ":
         cleaned = cleaned[7:].strip()
-    cleaned = cleaned.replace("\r", "").replace("\n", "")
-    if not cleaned:
-        return None
-    return cleaned
+    return cleaned or None
 
 
-def ensure_dspy_configured(
-    model: str | None = None,
-    *,
-    api_key: str | None = None,
-    api_base: str | None = None,
-    model_type: str | None = None,
-    inference_provider: str | None = None,
-) -> Any:
-    global _configured_lm
-    if _configured_lm is not None and model is None:
-        return _configured_lm
-    dspy = get_dspy()
+class _LMSettings(NamedTuple):
+    """Everything ``dspy.LM`` is built from, resolved from arguments and env."""
+
+    model: str
+    api_key: str | None
+    api_base: str | None
+    model_type: str | None
+    reasoning_effort: str | None
+
+    def lm_kwargs(self) -> dict[str, object]:
+        kwargs: dict[str, object] = {}
+        if self.api_key:
+            kwargs["api_key"] = self.api_key
+        if self.api_base:
+            kwargs["api_base"] = self.api_base
+        if self.model_type:
+            kwargs["model_type"] = self.model_type
+        if self.reasoning_effort:
+            kwargs["reasoning_effort"] = self.reasoning_effort
+        return kwargs
 
+
+def _resolve_lm_settings(
+    model: str | None,
+    api_key: str | None,
+    api_base: str | None,
+    model_type: str | None,
+    inference_provider: str | None,
+) -> _LMSettings:
     model_name = model or os.getenv("OG_AGENT_MODEL", _DEFAULT_MODEL)
     api_key = _sanitize_api_key(api_key or os.getenv("OG_AGENT_API_KEY"))
     api_base = api_base or os.getenv("OG_AGENT_API_BASE")
@@ -79,27 +100,46 @@ def ensure_dspy_configured(
         provider=provider,
     )
 
-    lm_kwargs: dict[str, object] = {}
-    if api_key:
-        lm_kwargs["api_key"] = api_key
-
-    if api_base:
-        lm_kwargs["api_base"] = api_base
     if not model_type and model_name.startswith("openai/gpt-5"):
         model_type = "responses"
-    if model_type:
-        lm_kwargs["model_type"] = model_type
     if not reasoning_effort and model_name == "openai/gpt-5.2-codex":
         reasoning_effort = "high"
-    if reasoning_effort:
-        lm_kwargs["reasoning_effort"] = reasoning_effort
+    return _LMSettings(effective_model_name, api_key, api_base, model_type, reasoning_effort)
 
-    lm = dspy.LM(effective_model_name, **lm_kwargs)
-    dspy.configure(lm=lm)
+
+def ensure_dspy_configured(
+    model: str | None = None,
+    *,
+    api_key: str | None = None,
+    api_base: str | None = None,
+    model_type: str | None = None,
+    inference_provider: str | None = None,
+) -> Any:
+    global _configured_lm, _configured_settings
+    if _configured_lm is not None and model is None:
+        return _configured_lm
+
+    settings = _resolve_lm_settings(model, api_key, api_base, model_type, inference_provider)
+    # Re-requesting the model that is already configured keeps the existing LM.
+    if _configured_lm is not None and settings == _configured_settings:
+        return _configured_lm
+
+    dspy = get_dspy()
+    lm = dspy.LM(settings.model, **settings.lm_kwargs())
+    dspy.configure(lm=lm, async_max_workers=_resolve_async_max_workers())
     _configured_lm = lm
+    _configured_settings = settings
     return lm
 
 
+def _resolve_async_max_workers() -> int:
+    try:
+        workers = int(os.getenv("OG_AGENT_ASYNC_MAX_WORKERS", str(_DEFAULT_ASYNC_MAX_WORKERS)))
+    except ValueError:
+        return _DEFAULT_ASYNC_MAX_WORKERS
+    return max(1, workers)
+
+
 def _normalize_inference_provider(value: str | None) -> str:
     normalized = (value or "auto").strip().lower()
     if normalized not in _VALID_INFERENCE_PROVIDERS:
@@ -107,22 +147,37 @@ def _normalize_inference_provider(value: str | None) -> str:
     return normalized
 
 
+class _ProviderEnv(NamedTuple):
+    api_key_vars: tuple[str, ...]
+    api_base_var: str | None = None
+
+
+# Keyed by the "<provider>/" prefix of the model name; the first non-empty
+# variable in api_key_vars wins.
+_PROVIDERS: dict[str, _ProviderEnv] = {
+    "openai": _ProviderEnv(("OPENAI_API_KEY", "OG_AGENT_OPENAI_API_KEY"), "OPENAI_API_BASE"),
+    "anthropic": _ProviderEnv(("ANTHROPIC_API_KEY", "OG_AGENT_ANTHROPIC_API_KEY")),
+}
+
+
+def _provider_env(model_name: str) -> _ProviderEnv | None:
+    prefix, sep, _ = model_name.partition("/")
+    return _PROVIDERS.get(prefix) if sep else None
+
+
 def _resolve_provider_api_base(
     model_name: str,
     api_base: str | None,
     provider: str,
 ) -> str | None:
+    _ = provider
     if api_base:
         return api_base
 
-    if provider == "openai":
-        if model_name.startswith("openai/"):
-            return os.getenv("OPENAI_API_BASE")
+    env = _provider_env(model_name)
+    if env is None or env.api_base_var is None:
         return None
-
-    if model_name.startswith("openai/"):
-        return os.getenv("OPENAI_API_BASE")
-    return None
+    return os.getenv(env.api_base_var)
 
 
 def _resolve_effective_model_name(
@@ -149,12 +204,11 @@ def _resolve_provider_api_key(
     if api_key:
         return _sanitize_api_key(api_key)
 
-    if model_name.startswith("openai/"):
-        return _sanitize_api_key(
-            os.getenv("OPENAI_API_KEY") or os.getenv("OG_AGENT_OPENAI_API_KEY")
-        )
-    if model_name.startswith("anthropic/"):
-        return _sanitize_api_key(
-            os.getenv("ANTHROPIC_API_KEY") or os.getenv("OG_AGENT_ANTHROPIC_API_KEY")
-        )
+    env = _provider_env(model_name)
+    if env is None:
+        return None
+    for name in env.api_key_vars:
+        value = os.getenv(name)
+        if value:
+            return _sanitize_api_key(value)
     return None
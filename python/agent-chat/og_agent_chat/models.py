@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from array import array
+from collections import deque
 from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
 from typing import Literal
 
@@ -8,8 +11,16 @@ ActionType = Literal["explain", "refactor"]
 SenderType = Literal["user", "agent", "system"]
 RuntimeType = Literal["local", "modal"]
 
+# Per-metric history kept in memory as packed float64 arrays (8 bytes a point
+# instead of a boxed float per list slot). Series are trimmed in chunks of
+# METRIC_TRIM_SLACK so the amortized cost per appended point stays O(1).
+MAX_METRIC_POINTS = 10_000
+METRIC_TRIM_SLACK = 1_000
+# Log lines kept in memory; older lines fall off the front of the ring.
+MAX_LOG_LINES = 10_000
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Alert:
     metric: str
     threshold: float
@@ -18,13 +29,13 @@ class Alert:
     timestamp: float
 
 
-@dataclass
+@dataclass(slots=True)
 class RunState:
     training_file: Path
     codebase_root: Path
     runtime: RuntimeType = "local"
-    metrics: dict[str, list[float]] = field(default_factory=dict)
-    logs: list[str] = field(default_factory=list)
+    metrics: dict[str, array[float]] = field(default_factory=dict)
+    logs: deque[str] = field(default_factory=lambda: deque(maxlen=MAX_LOG_LINES))
     alerts: list[Alert] = field(default_factory=list)
     current_step: int = 0
     is_active: bool = True
@@ -43,6 +54,28 @@ class RunState:
     rollout_lease_deadline: float | None = None
     rollout_last_transition_ts: float | None = None
     rollout_last_error: str | None = None
+    _training_text_cache: tuple[Path, int, int, str] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _log_tail_cache: tuple[int, str] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def training_text(self) -> str:
+        """Return the training file contents, re-reading only when it changed on disk."""
+        path = self.training_file
+        stat = path.stat()
+        cached = self._training_text_cache
+        if (
+            cached is not None
+            and cached[0] == path
+            and cached[1] == stat.st_mtime_ns
+            and cached[2] == stat.st_size
+        ):
+            return cached[3]
+        text = path.read_text(encoding="utf-8")
+        self._training_text_cache = (path, stat.st_mtime_ns, stat.st_size, text)
+        return text
 
     def latest_alert(self) -> Alert | None:
         if not self.alerts:
@@ -50,14 +83,36 @@ class RunState:
         return self.alerts[-1]
 
     def metric_tail(self, metric: str, n: int = 20) -> list[float]:
-        values = self.metrics.get(metric, [])
-        return values[-n:]
+        values = self.metrics.get(metric)
+        if values is None:
+            return []
+        return values[-n:].tolist()
+
+    def log_lines(self, n: int = 50) -> list[str]:
+        """Return the last n log lines, walking back from the newest entry."""
+        logs = self.logs
+        if 0 < n < len(logs):
+            tail = list(islice(reversed(logs), n))
+            tail.reverse()
+            return tail
+        return list(logs)[-n:]
 
     def log_tail(self, n: int = 50) -> str:
-        return "\n".join(self.logs[-n:])
+        """Return the last n log lines joined; reused until the next append_log."""
+        cached = self._log_tail_cache
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        text = "\n".join(self.log_lines(n))
+        self._log_tail_cache = (n, text)
+        return text
 
     def add_metric(self, metric: str, value: float, step: int | None = None) -> None:
-        self.metrics.setdefault(metric, []).append(float(value))
+        values = self.metrics.get(metric)
+        if values is None:
+            values = self.metrics[metric] = array("d")
+        values.append(float(value))
+        if len(values) > MAX_METRIC_POINTS + METRIC_TRIM_SLACK:
+            del values[:-MAX_METRIC_POINTS]
         if step is not None:
             try:
                 self.current_step = max(self.current_step, int(step))
@@ -66,12 +121,13 @@ class RunState:
 
     def append_log(self, line: str) -> None:
         self.logs.append(line)
+        self._log_tail_cache = None
 
     def add_alert(self, alert: Alert) -> None:
         self.alerts.append(alert)
 
 
-@dataclass
+@dataclass(slots=True)
 class ActionPlan:
     diagnosis: str
     action: ActionType
@@ -82,14 +138,14 @@ class ActionPlan:
         return self.action == "refactor"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ExecutionResult:
     success: bool
     checkpoint_id: str | None = None
     error: str | None = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ChatMessage:
     sender: SenderType
     content: str
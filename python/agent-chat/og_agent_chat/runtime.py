@@ -1,15 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
 import contextlib
 import os
+import re
 import shlex
 import sys
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Awaitable, Callable, Literal, Protocol
 
 RuntimeType = Literal["local", "modal"]
+# An OOM marker within this many trailing output lines classifies a failed
+# run as an OOM.
+RECENT_LINE_LIMIT = 200
+# Output is drained in chunks of this size; a line that grows past
+# STREAM_LINE_LIMIT without a newline is emitted as-is rather than buffered.
+STREAM_CHUNK_BYTES = 1 << 16
+STREAM_LINE_LIMIT = 1 << 20
+# Output-driven heartbeats are coalesced to at most one per interval.
+HEARTBEAT_MIN_INTERVAL_SECS = 0.25
+# Grace period between SIGTERM and SIGKILL in stop().
+STOP_GRACE_SECS = 5.0
 
 
 @dataclass
@@ -36,19 +50,23 @@ class RuntimeAdapter(Protocol):
     async def close(self) -> None: ...
 
 
+_OOM_TOKENS = (
+    "out of memory",
+    "cublas_status_alloc_failed",
+    "memoryerror",
+    "killed process",
+)
+# One case-insensitive alternation scans the text once, without lowering a
+# copy of it first. "oom" must start a word (OOM, OOMKilled, oom-killer) so
+# words such as "zoom" or "room" do not count.
+_OOM_PATTERN = re.compile(
+    "|".join([*map(re.escape, _OOM_TOKENS), r"\boom"]),
+    re.IGNORECASE,
+)
+
+
 def _looks_like_oom_text(text: str) -> bool:
-    normalized = (text or "").lower()
-    return any(
-        token in normalized
-        for token in (
-            "out of memory",
-            "cuda out of memory",
-            "cublas_status_alloc_failed",
-            "memoryerror",
-            "killed process",
-            "oom",
-        )
-    )
+    return bool(text) and _OOM_PATTERN.search(text) is not None
 
 
 class LocalRuntimeAdapter:
@@ -81,17 +99,20 @@ class LocalRuntimeAdapter:
         self._process: asyncio.subprocess.Process | None = None
         self._log_task: asyncio.Task[None] | None = None
         self._stop_requested = False
-        self._recent_lines: list[str] = []
+        # OOM markers are matched as output streams in, so a failed exit only
+        # compares line numbers instead of rescanning the tail.
+        self._lines_seen = 0
+        self._last_oom_line = -RECENT_LINE_LIMIT
+        self._last_heartbeat = float("-inf")
 
     def _build_env(self) -> dict[str, str]:
-        env = dict(os.environ)
-        env.setdefault("OGD_SOCKET", str(self.socket_path))
+        # Defaults yield to the inherited environment, which yields to the
+        # overrides; one merge instead of a copy plus per-key probes.
+        defaults = {"OGD_SOCKET": str(self.socket_path), "ENABLE_TB": "1"}
         if self.run_dir is not None:
             self.run_dir.mkdir(parents=True, exist_ok=True)
-            env.setdefault("TB_LOG_DIR", str(self.run_dir))
-        env.setdefault("ENABLE_TB", "1")
-        env.update(self.runtime_env_overrides)
-        return env
+            defaults["TB_LOG_DIR"] = str(self.run_dir)
+        return {**defaults, **os.environ, **self.runtime_env_overrides}
 
     def _resolve_command(self) -> list[str]:
         if self.training_cmd and self.training_cmd.strip():
@@ -102,18 +123,27 @@ class LocalRuntimeAdapter:
         return [sys.executable, str(self.training_file)]
 
     async def _stream_logs(self, process: asyncio.subprocess.Process) -> None:
-        if process.stdout is None:
+        stdout = process.stdout
+        if stdout is None:
             return
-        while True:
-            line = await process.stdout.readline()
-            if not line:
-                break
-            text = line.decode("utf-8", errors="replace").rstrip("\n")
-            self._recent_lines.append(text)
-            if len(self._recent_lines) > 400:
-                self._recent_lines = self._recent_lines[-400:]
-            self.on_log(text)
-            self.on_heartbeat()
+        # The incremental decoder carries a multi-byte character split across
+        # reads, including when an overlong line is flushed mid-sequence.
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        while chunk := await stdout.read(STREAM_CHUNK_BYTES):
+            pending += decoder.decode(chunk)
+            end = pending.rfind("\n")
+            if end < 0:
+                if len(pending) < STREAM_LINE_LIMIT:
+                    continue
+                end = len(pending)
+            self._emit_output(pending[:end])
+            pending = pending[end + 1 :]
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            self._emit_output(pending)
+        # Output inside the last throttle window still counts as liveness.
+        self.on_heartbeat()
         return_code = await process.wait()
         self.on_log(f"[system] training exited with code {return_code}")
         if self._stop_requested:
@@ -122,8 +152,7 @@ class LocalRuntimeAdapter:
             self.on_log("[system] training completed successfully")
             await self.on_complete("completed")
             return
-        recent = "\n".join(self._recent_lines[-200:])
-        is_oom = _looks_like_oom_text(recent)
+        is_oom = self._last_oom_line > self._lines_seen - RECENT_LINE_LIMIT
         await self.on_failure(
             RuntimeFailure(
                 status="failed",
@@ -137,10 +166,30 @@ class LocalRuntimeAdapter:
             )
         )
 
+    def _emit_output(self, block: str) -> None:
+        """Log each line of ``block``, a run of complete output lines."""
+        if "\r" in block:
+            # CRLF line endings (e.g. Windows tools) log the same as LF.
+            block = block.replace("\r\n", "\n").removesuffix("\r")
+        lines = block.split("\n")
+        self._lines_seen += len(lines)
+        # One search per block settles the common no-OOM case; only a block
+        # that has a marker is walked again to find the last one.
+        if _looks_like_oom_text(block):
+            *_, last_oom = _OOM_PATTERN.finditer(block)
+            self._last_oom_line = self._lines_seen - block.count("\n", last_oom.end())
+        for text in lines:
+            self.on_log(text)
+        now = time.monotonic()
+        if now - self._last_heartbeat >= HEARTBEAT_MIN_INTERVAL_SECS:
+            self._last_heartbeat = now
+            self.on_heartbeat()
+
     async def start(self) -> RuntimeStartResult:
         await self.stop()
         self._stop_requested = False
-        self._recent_lines = []
+        self._lines_seen = 0
+        self._last_oom_line = -RECENT_LINE_LIMIT
         command = self._resolve_command()
         process = await asyncio.create_subprocess_exec(
             *command,
@@ -151,11 +200,10 @@ class LocalRuntimeAdapter:
         )
         self._process = process
         self.on_log(f"[system] training restarted (pid={process.pid})")
-        self.on_log(
-            "[system] launch command: " + " ".join(shlex.quote(part) for part in command)
-        )
+        self.on_log(f"[system] launch command: {shlex.join(command)}")
         if self.run_dir is not None:
             self.on_log(f"[system] TB_LOG_DIR={self.run_dir}")
+        self._last_heartbeat = time.monotonic()
         self.on_heartbeat()
         self._log_task = asyncio.create_task(self._stream_logs(process))
         return RuntimeStartResult(runtime_id=str(process.pid))
@@ -168,7 +216,7 @@ class LocalRuntimeAdapter:
         if process is not None and process.returncode is None:
             process.terminate()
             try:
-                await asyncio.wait_for(process.wait(), timeout=5)
+                await asyncio.wait_for(process.wait(), timeout=STOP_GRACE_SECS)
             except TimeoutError:
                 process.kill()
                 await process.wait()
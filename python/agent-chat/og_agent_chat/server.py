@@ -574,10 +574,15 @@ async def serve(config: DaemonConfig) -> None:
     )
     alert_detector = AlertDetector(config.alert_rules)
 
+    # Clients may keep their connection open across requests; track them so
+    # shutdown can close them instead of waiting on idle connections.
+    client_writers: set[asyncio.StreamWriter] = set()
+
     async def handle_client(
         reader: asyncio.StreamReader,
         writer: asyncio.StreamWriter,
     ) -> None:
+        client_writers.add(writer)
         try:
             while True:
                 try:
@@ -620,6 +625,7 @@ async def serve(config: DaemonConfig) -> None:
                 return
             LOGGER.exception("Client handler failed")
         finally:
+            client_writers.discard(writer)
             try:
                 writer.close()
                 await writer.wait_closed()
@@ -681,8 +687,13 @@ async def serve(config: DaemonConfig) -> None:
                     await _restart_training_process(run_state)
                 except Exception as exc:
                     run_state.append_log(f"[error] failed to start training: {exc}")
-            await server.serve_forever()
+            # The server is already accepting; park here rather than in
+            # serve_forever(), whose cancellation waits on idle clients
+            # before this block gets a chance to close them.
+            await asyncio.get_running_loop().create_future()
         finally:
+            for client_writer in list(client_writers):
+                client_writer.close()
             runtime_watchdog_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await runtime_watchdog_task
@@ -723,8 +734,8 @@ async def _handle_payload(
         for metric, values in run_state.metrics.items():
             if not values:
                 continue
-            metrics_payload[metric] = values[-metric_tail:]
-        logs_payload = run_state.logs[-log_tail:]
+            metrics_payload[metric] = values[-metric_tail:].tolist()
+        logs_payload = run_state.log_lines(log_tail)
         alerts_payload = [_serialize_alert(alert) for alert in run_state.alerts]
         return {
             "ok": True,
@@ -787,6 +798,36 @@ async def _handle_payload(
                 response["agent_response"] = _serialize_plan(agent_response.plan)
         return response
 
+    if msg_type == "metrics_batch":
+        metrics = payload.get("metrics")
+        step = payload.get("step")
+        if not isinstance(metrics, dict) or not metrics:
+            return {"ok": False, "error": "missing_metrics"}
+        try:
+            values = {str(name): float(value) for name, value in metrics.items()}
+        except (TypeError, ValueError):
+            return {"ok": False, "error": "invalid_value"}
+        for metric, value in values.items():
+            run_state.add_metric(metric, value, step=step)
+
+        response = {"ok": True}
+        alerts_payload: list[dict[str, Any]] = []
+        agent_payload: list[dict[str, Any]] = []
+        for metric in values:
+            alert = alert_detector.check(run_state, metric=metric)
+            if not alert:
+                continue
+            run_state.add_alert(alert)
+            agent_response = await agent.handle_alert(alert)
+            alerts_payload.append(_serialize_alert(alert))
+            if agent_response:
+                agent_payload.append(_serialize_plan(agent_response.plan))
+        if alerts_payload:
+            response["alerts"] = alerts_payload
+        if agent_payload:
+            response["agent_responses"] = agent_payload
+        return response
+
     if msg_type == "log_append":
         line = payload.get("line")
         if not line:
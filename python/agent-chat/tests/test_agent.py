@@ -3,6 +3,9 @@ from __future__ import annotations
 import asyncio
 import difflib
 import json
+import threading
+import time
+from types import SimpleNamespace
 
 import pytest
 
@@ -12,11 +15,13 @@ from og_agent_chat.agent import (
     AgentEngine,
     GuardedExecutor,
     _normalize_diff_text,
+    _parse_diff,
     _patch_targets_file,
     apply_diff,
     create_checkpoint,
     restore_checkpoint,
 )
+from og_agent_chat.codebase import CodebaseIndex
 from og_agent_chat.models import ActionPlan, Alert, RunState
 
 
@@ -59,6 +64,24 @@ def test_action_planner_parses_refactor_response_sections() -> None:
     assert plan.raw_output == raw
 
 
+@pytest.mark.parametrize(
+    "raw",
+    [
+        "**DIAGNOSIS:** LR is too high.\n**ACTION:** refactor\n**CODE_CHANGES:**\n",
+        "  DIAGNOSIS: LR is too high.\n  ACTION: refactor\n  CODE_CHANGES:\n",
+        "## DIAGNOSIS: LR is too high.\n## ACTION: refactor\n## CODE_CHANGES:\n",
+    ],
+)
+def test_action_planner_accepts_indented_and_markdown_labels(raw: str) -> None:
+    diff = "--- a/train.py\n+++ b/train.py\n@@ -1,2 +1,2 @@\n # NOTE: tuned\n-LR = 0.1\n+LR = 0.001"
+
+    plan = ActionPlanner().parse_response(raw + diff)
+
+    assert plan.diagnosis == "LR is too high."
+    assert plan.action == "refactor"
+    assert plan.code_changes == diff
+
+
 def test_action_planner_falls_back_to_explain_and_drops_code_changes() -> None:
     planner = ActionPlanner()
 
@@ -127,6 +150,40 @@ def test_apply_diff_updates_file_when_patch_targets_relative_path(tmp_path) -> N
     assert run_state.training_file.read_text(encoding="utf-8") == "value = 2\n"
 
 
+def test_create_checkpoint_suffixes_ids_taken_in_the_same_second(tmp_path, monkeypatch) -> None:
+    run_state = _make_run_state(tmp_path, content="value = 1\n")
+    checkpoint_dir = tmp_path / "checkpoints"
+    monkeypatch.setattr(agent_module.time, "time", lambda: 42.0)
+
+    ids = [create_checkpoint(run_state, checkpoint_dir) for _ in range(3)]
+
+    assert ids == ["ckpt_42", "ckpt_42_1", "ckpt_42_2"]
+    assert all((checkpoint_dir / ckpt / "train.py").exists() for ckpt in ids)
+
+
+def test_parse_diff_reads_hunks_and_skips_git_preamble() -> None:
+    patch = _parse_diff(
+        "diff --git a/train.py b/train.py\n"
+        "index 1111111..2222222 100644\n"
+        "--- a/train.py\t2026-03-01\n"
+        "+++ b/train.py\n"
+        "@@ -1,2 +1,2 @@\n"
+        " keep = 1\n"
+        "-value = 1\n"
+        "\\ No newline at end of file\n"
+        "+value = 2\n"
+    )
+
+    assert len(patch) == 1
+    assert (patch[0].source_file, patch[0].target_file) == ("a/train.py", "b/train.py")
+    [hunk] = patch[0].hunks
+    assert (hunk.source_start, hunk.source_length) == (1, 2)
+    assert hunk.ops == [(" ", "keep = 1\n"), ("-", "value = 1\n"), ("+", "value = 2\n")]
+
+    with pytest.raises(ValueError, match="shorter than expected"):
+        _parse_diff("--- a/train.py\n+++ b/train.py\n@@ -1,2 +1,2 @@\n keep = 1\n")
+
+
 def test_create_and_restore_checkpoint_round_trip(tmp_path, monkeypatch) -> None:
     run_state = _make_run_state(tmp_path, content="value = 1\n")
     run_state.add_metric("loss", 0.9, step=3)
@@ -187,6 +244,74 @@ def test_fast_demo_refactor_plan_builds_stabilizing_patch_for_demo_file(tmp_path
     assert 'BATCH_SIZE = int(os.getenv("DEMO_BATCH", "32"))' in plan.code_changes
 
 
+def test_respond_awaits_async_model_calls(tmp_path) -> None:
+    run_state = _make_run_state(tmp_path, content="value = 1\n")
+    engine = AgentEngine(run_state=run_state, codebase_root=tmp_path)
+    calls: list[str] = []
+
+    async def arun(context: str, question: str) -> str:
+        calls.append("react")
+        assert "TRAINING_SCRIPT" in context
+        return "DIAGNOSIS: Loss is flat.\nACTION: refactor\nCODE_CHANGES:\n"
+
+    async def apropose_diff(
+        run_state: RunState, diagnosis: str, alert: Alert | None = None
+    ) -> str:
+        calls.append("editor")
+        return "--- a/train.py\n+++ b/train.py\n"
+
+    engine.codebase_index = CodebaseIndex.from_root(tmp_path)
+    engine.explorer = SimpleNamespace()
+    engine.tool_caller = SimpleNamespace(arun=arun)
+    engine.editor = SimpleNamespace(apropose_diff=apropose_diff)
+
+    response = asyncio.run(engine.handle_chat_message("Why is loss flat?"))
+
+    assert response.plan.action == "refactor"
+    assert response.plan.code_changes == "--- a/train.py\n+++ b/train.py"
+    assert calls == ["react", "editor"]
+
+
+def test_concurrent_first_requests_build_the_index_once_and_dspy_on_the_loop(
+    tmp_path, monkeypatch
+) -> None:
+    run_state = _make_run_state(tmp_path, content="value = 1\n")
+    engine = AgentEngine(run_state=run_state, codebase_root=tmp_path)
+    loop_thread = threading.get_ident()
+    index_threads: list[int] = []
+    module_threads: list[int] = []
+    real_from_root = CodebaseIndex.from_root
+
+    def slow_from_root(root):
+        index_threads.append(threading.get_ident())
+        time.sleep(0.05)
+        return real_from_root(root)
+
+    async def arun(context: str, question: str) -> str:
+        return "DIAGNOSIS: Loss is flat.\nACTION: explain\n"
+
+    def fake_module(*args, **kwargs) -> SimpleNamespace:
+        module_threads.append(threading.get_ident())
+        return SimpleNamespace(arun=arun)
+
+    monkeypatch.setattr(agent_module.CodebaseIndex, "from_root", slow_from_root)
+    monkeypatch.setattr(agent_module, "CodebaseExplorer", fake_module)
+    monkeypatch.setattr(agent_module, "ToolCaller", fake_module)
+    monkeypatch.setattr(agent_module, "CodeEditor", fake_module)
+
+    async def ask_twice() -> list:
+        return await asyncio.gather(
+            engine.handle_chat_message("Why is loss flat?"),
+            engine.handle_chat_message("Is the LR too high?"),
+        )
+
+    responses = asyncio.run(ask_twice())
+
+    assert len(index_threads) == 1 and index_threads[0] != loop_thread
+    assert module_threads == [loop_thread] * 3
+    assert [response.plan.diagnosis for response in responses] == ["Loss is flat."] * 2
+
+
 def test_summarize_diff_changes_reports_assignment_updates() -> None:
     summary = AgentEngine._summarize_diff_changes(
         "--- a/train.py\n"
@@ -201,9 +326,8 @@ def test_summarize_diff_changes_reports_assignment_updates() -> None:
     assert summary == "Refactor summary: ALPHA: 1 -> 2 | BETA: removed | GAMMA: set to 4"
 
 
-def test_guarded_executor_returns_checkpoint_for_explain_plan(tmp_path, monkeypatch) -> None:
+def test_guarded_executor_skips_checkpoint_for_explain_plan(tmp_path) -> None:
     run_state = _make_run_state(tmp_path, content="value = 1\n")
-    monkeypatch.setattr(agent_module.time, "time", lambda: 2000.0)
     executor = GuardedExecutor(auto_mode=False, checkpoint_dir=tmp_path / "ckpts")
 
     result = asyncio.run(
@@ -219,7 +343,8 @@ def test_guarded_executor_returns_checkpoint_for_explain_plan(tmp_path, monkeypa
     )
 
     assert result.success is True
-    assert result.checkpoint_id == "ckpt_2000"
+    assert result.checkpoint_id is None
+    assert not (tmp_path / "ckpts").exists()
     assert run_state.training_file.read_text(encoding="utf-8") == "value = 1\n"
 
 
@@ -254,6 +379,84 @@ def test_guarded_executor_applies_refactor_and_awaits_restart_callback(tmp_path)
     assert restarted == ["value = 2\n"]
 
 
+def test_execute_plan_runs_concurrent_plans_one_at_a_time(tmp_path) -> None:
+    run_state = _make_run_state(tmp_path, content="value = 1\n")
+    running: list[str] = []
+    overlaps: list[list[str]] = []
+
+    async def restart_callback(state: RunState) -> None:
+        running.append(state.training_file.read_text(encoding="utf-8"))
+        await asyncio.sleep(0.01)
+        overlaps.append(list(running))
+        running.clear()
+
+    engine = AgentEngine(
+        run_state=run_state,
+        codebase_root=tmp_path,
+        restart_callback=restart_callback,
+    )
+    engine.executor.checkpoint_dir = tmp_path / "ckpts"
+
+    def plan(before: str, after: str) -> ActionPlan:
+        return ActionPlan(
+            diagnosis="Apply patch",
+            action="refactor",
+            code_changes=_make_diff(before, after, "a/train.py", "b/train.py"),
+            raw_output="raw",
+        )
+
+    async def apply_both() -> list:
+        return await asyncio.gather(
+            engine.execute_plan(plan("value = 1\n", "value = 2\n")),
+            engine.execute_plan(plan("value = 2\n", "value = 3\n")),
+        )
+
+    results = asyncio.run(apply_both())
+
+    assert [result.success for result in results] == [True, True]
+    assert overlaps == [["value = 2\n"], ["value = 3\n"]]
+    assert run_state.training_file.read_text(encoding="utf-8") == "value = 3\n"
+
+
+def test_execute_plan_does_not_wait_for_an_in_flight_llm_call(tmp_path) -> None:
+    run_state = _make_run_state(tmp_path, content="value = 1\n")
+    engine = AgentEngine(run_state=run_state, codebase_root=tmp_path)
+    engine.executor.checkpoint_dir = tmp_path / "ckpts"
+
+    diff_text = _make_diff("value = 1\n", "value = 2\n", "a/train.py", "b/train.py")
+
+    async def scenario() -> bool:
+        release = asyncio.Event()
+
+        async def arun(context: str, question: str) -> str:
+            await release.wait()
+            return "DIAGNOSIS: Loss is flat.\nACTION: explain\n"
+
+        engine.codebase_index = CodebaseIndex.from_root(tmp_path)
+        engine.explorer = SimpleNamespace()
+        engine.tool_caller = SimpleNamespace(arun=arun)
+        engine.editor = SimpleNamespace()
+        chat = asyncio.create_task(engine.handle_chat_message("Why is loss flat?"))
+        await asyncio.sleep(0)
+        result = await asyncio.wait_for(
+            engine.execute_plan(
+                ActionPlan(
+                    diagnosis="Apply patch",
+                    action="refactor",
+                    code_changes=diff_text,
+                    raw_output="raw",
+                )
+            ),
+            timeout=5,
+        )
+        release.set()
+        await chat
+        return result.success
+
+    assert asyncio.run(scenario()) is True
+    assert run_state.training_file.read_text(encoding="utf-8") == "value = 2\n"
+
+
 def test_guarded_executor_restores_checkpoint_when_apply_fails(tmp_path, monkeypatch) -> None:
     run_state = _make_run_state(tmp_path, content="value = 1\n")
     monkeypatch.setattr(agent_module.time, "time", lambda: 3000.0)
@@ -57,6 +57,16 @@ def test_stall_rule_detects_insufficient_improvement() -> None:
     assert rule.evaluate([5.0, 4.0, 3.0]) is False
 
 
+def test_rule_comparisons_and_directions_are_resolved_at_construction() -> None:
+    assert ThresholdRule(metric="m", threshold=1.0, comparison="lte").evaluate([1.0]) is True
+    assert ThresholdRule(metric="m", threshold=1.0, comparison="lt").evaluate([1.0]) is False
+    assert ThresholdRule(metric="m", threshold=1.0, comparison="eq").evaluate([1.0]) is False
+
+    rising = StallRule(metric="m", window=2, min_delta=0.5, direction="increase")
+    assert rising.evaluate([1.0, 1.2]) is True
+    assert rising.evaluate([1.0, 2.0]) is False
+
+
 def test_load_alert_rules_from_env_parses_threshold_and_stall_rules(
     monkeypatch,
 ) -> None:
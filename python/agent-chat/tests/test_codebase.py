@@ -8,6 +8,10 @@ def test_from_root_ignores_dirs_and_tracks_truncated_files(tmp_path) -> None:
     (tmp_path / "notes.txt").write_text("ignore me\n", encoding="utf-8")
     (tmp_path / "node_modules").mkdir()
     (tmp_path / "node_modules" / "skip.py").write_text("print('skip')\n", encoding="utf-8")
+    (tmp_path / "pkg" / "build").mkdir(parents=True)
+    (tmp_path / "pkg" / "build" / "skip.py").write_text("print('skip')\n", encoding="utf-8")
+    (tmp_path / "pkg" / "model.py").write_text("print('model')\n", encoding="utf-8")
+    (tmp_path / "weights.json").write_bytes(b"{\x00\x01binary")
     (tmp_path / "big.md").write_text("x" * 30, encoding="utf-8")
 
     index = CodebaseIndex.from_root(
@@ -17,7 +21,7 @@ def test_from_root_ignores_dirs_and_tracks_truncated_files(tmp_path) -> None:
     )
 
     doc_names = {doc.path.name for doc in index.documents}
-    assert doc_names == {"big.md", "keep.py"}
+    assert doc_names == {"big.md", "keep.py", "model.py"}
     assert (tmp_path / "big.md") in index.truncated
 
     big_doc = next(doc for doc in index.documents if doc.path.name == "big.md")
@@ -51,3 +55,57 @@ def test_search_regex_is_case_insensitive_and_honors_max_matches(tmp_path) -> No
         "search.py:1: alpha",
         "search.py:2: ALPHA",
     ]
+
+
+def test_search_regex_reports_each_matching_line_once_with_line_anchors(tmp_path) -> None:
+    (tmp_path / "train.py").write_text(
+        "lr = 0.1  # lr\n  warmup = 3\nbatch = 8\nlr_mult = 4\n",
+        encoding="utf-8",
+    )
+
+    index = CodebaseIndex.from_root(tmp_path, max_total_chars=500)
+
+    assert index.search_regex("lr") == ["train.py:1: lr = 0.1  # lr", "train.py:4: lr_mult = 4"]
+    assert index.search_regex("^warmup") == []
+    assert index.search_regex(r"\d$") == [
+        "train.py:2: warmup = 3",
+        "train.py:3: batch = 8",
+        "train.py:4: lr_mult = 4",
+    ]
+
+
+def test_from_root_normalizes_crlf_line_endings(tmp_path) -> None:
+    (tmp_path / "train.py").write_bytes(b"lr = 0.1\r\n  warmup = 3\r\n")
+
+    index = CodebaseIndex.from_root(tmp_path, max_total_chars=500)
+
+    assert index.documents[0].content == "lr = 0.1\n  warmup = 3\n"
+    assert index.search_regex("warmup = 3$") == ["train.py:2: warmup = 3"]
+
+
+def test_search_regex_does_not_match_across_lines(tmp_path) -> None:
+    (tmp_path / "train.py").write_text(
+        "import os\n\n\nlr = 0.1\ndef train():\n    pass\n",
+        encoding="utf-8",
+    )
+
+    index = CodebaseIndex.from_root(tmp_path, max_total_chars=500)
+
+    assert index.search_regex(r"\s*lr\s*=") == ["train.py:4: lr = 0.1"]
+    assert index.search_regex(r"\s+def") == []
+
+
+def test_cached_renderings_are_reused_until_refresh(tmp_path) -> None:
+    (tmp_path / "first.py").write_text("print(1)\n", encoding="utf-8")
+    index = CodebaseIndex.from_root(tmp_path, max_total_chars=500)
+
+    context = index.context_text
+    assert index.context_text is context
+    assert index.default_listing == "first.py"
+
+    index.documents.clear()
+    assert index.context_text is context
+
+    index.refresh()
+    assert index.context_text == ""
+    assert index.default_listing == ""
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import math
 import socket
+import threading
+from array import array
 
 import pytest
 
 import og_agent_chat.client as client_module
-from og_agent_chat.client import OGDClientError, _recv_line, send_metric, send_request
+from og_agent_chat.client import (
+    OGDClientError,
+    OGDConnection,
+    _decode,
+    _encode,
+    _send_all,
+    send_metric,
+    send_metrics,
+    send_request,
+)
 from og_agent_chat.config import (
     _normalize_inference_provider,
+    _resolve_lm_settings,
     _resolve_provider_api_base,
     _resolve_provider_api_key,
     _sanitize_api_key,
@@ -38,22 +51,183 @@ def test_provider_resolution_prefers_expected_environment_variables(
     assert _resolve_provider_api_key("anthropic/claude", None, api_base=None, provider="auto") == "anthropic-key"
 
 
-def test_recv_line_stops_at_first_newline() -> None:
+def test_lm_settings_apply_model_defaults(monkeypatch) -> None:
+    for name in (
+        "OG_AGENT_MODEL",
+        "OG_AGENT_API_KEY",
+        "OG_AGENT_API_BASE",
+        "OPENAI_API_BASE",
+        "OG_AGENT_MODEL_TYPE",
+        "OG_AGENT_REASONING_EFFORT",
+    ):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OPENAI_API_KEY", "openai-key")
+
+    settings = _resolve_lm_settings(None, None, None, None, None)
+
+    assert settings.model == "openai/gpt-5.2-codex"
+    assert settings.lm_kwargs() == {
+        "api_key": "openai-key",
+        "model_type": "responses",
+        "reasoning_effort": "high",
+    }
+    assert _resolve_lm_settings("anthropic/claude", "sk-x", None, None, None).lm_kwargs() == {
+        "api_key": "sk-x"
+    }
+
+
+def _socketpair_connection() -> tuple[OGDConnection, socket.socket]:
     left, right = socket.socketpair()
+    conn = OGDConnection()
+    conn._sock = left
+    return conn, right
+
+
+def test_read_line_stops_at_first_newline_and_keeps_the_rest() -> None:
+    conn, right = _socketpair_connection()
+    try:
+        right.sendall(b'{"ok": true}\n{"ok": false}\ntrailing')
+        assert conn._read_line() == b'{"ok": true}'
+        assert conn._read_line() == b'{"ok": false}'
+    finally:
+        conn.close()
+        right.close()
+
+
+def test_send_all_and_read_line_handle_payloads_larger_than_one_chunk() -> None:
+    conn, right = _socketpair_connection()
+    body = b"x" * 200_000
+    received: list[bytes] = []
     try:
-        right.sendall(b'{"ok": true}\ntrailing-bytes')
-        assert _recv_line(left) == b'{"ok": true}'
+        reader = threading.Thread(target=lambda: received.append(conn._read_line()))
+        reader.start()
+        _send_all(right, [body, b"\n"])
+        reader.join(timeout=5)
+        assert received == [body]
     finally:
-        left.close()
+        conn.close()
         right.close()
 
 
+def test_encode_keeps_non_finite_metric_values() -> None:
+    payload = {"type": "metrics_batch", "metrics": {"loss": float("nan"), "lr": float("inf")}}
+
+    decoded = _decode(_encode(payload))
+
+    assert math.isnan(decoded["metrics"]["loss"])
+    assert decoded["metrics"]["lr"] == float("inf")
+
+
+def test_encode_keeps_none_and_array_values() -> None:
+    payload = {
+        "type": "metrics_batch",
+        "metrics": {"loss": array("d", [float("nan"), 0.5]), "note": "nullable"},
+        "step": None,
+    }
+
+    decoded = _decode(_encode(payload))
+
+    assert math.isnan(decoded["metrics"]["loss"][0])
+    assert decoded["metrics"]["loss"][1] == 0.5
+    assert decoded["metrics"]["note"] == "nullable"
+    assert decoded["step"] is None
+
+
 def test_send_request_requires_existing_socket(tmp_path) -> None:
     missing = tmp_path / "missing.sock"
     with pytest.raises(OGDClientError, match="Socket not found"):
         send_request({"type": "ping"}, missing)
 
 
+def _serve_connections(listener: socket.socket, plan: list[int], accepted: list[int]) -> None:
+    # Each accepted connection answers its planned number of requests, then
+    # hangs up.
+    for answers in plan:
+        peer, _ = listener.accept()
+        accepted.append(answers)
+        with peer, peer.makefile("rb") as lines:
+            for _ in range(answers):
+                lines.readline()
+                peer.sendall(b'{"ok": true}\n')
+
+
+def test_connection_reuses_its_socket_and_resends_after_an_idle_drop(tmp_path) -> None:
+    socket_path = tmp_path / "ogd.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_path))
+    listener.listen()
+    accepted: list[int] = []
+    server = threading.Thread(target=_serve_connections, args=(listener, [2], accepted))
+    server.start()
+    try:
+        with OGDConnection(socket_path) as conn:
+            for _ in range(2):
+                assert send_request({"type": "ping"}, conn=conn) == {"ok": True}
+            # The daemon has hung up on the idle socket before the next send.
+            server.join(timeout=5)
+            server = threading.Thread(
+                target=_serve_connections, args=(listener, [1], accepted)
+            )
+            server.start()
+            assert send_request({"type": "ping"}, conn=conn) == {"ok": True}
+        server.join(timeout=5)
+        assert accepted == [2, 1]
+    finally:
+        listener.close()
+
+
+def test_connection_does_not_replay_a_request_that_was_sent(tmp_path) -> None:
+    socket_path = tmp_path / "ogd.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_path))
+    listener.listen()
+    received: list[bytes] = []
+
+    def serve() -> None:
+        peer, _ = listener.accept()
+        with peer, peer.makefile("rb") as lines:
+            lines.readline()
+            peer.sendall(b'{"ok": true}\n')
+            # Read the next request, then drop the connection unanswered.
+            received.append(lines.readline())
+
+    server = threading.Thread(target=serve)
+    server.start()
+    try:
+        with OGDConnection(socket_path) as conn:
+            assert send_request({"type": "ping"}, conn=conn) == {"ok": True}
+            with pytest.raises(OGDClientError, match="No response"):
+                send_request({"type": "chat_message", "content": "hi"}, conn=conn)
+            server.join(timeout=5)
+            listener.settimeout(0.2)
+            with pytest.raises(socket.timeout):
+                listener.accept()
+        assert len(received) == 1 and b"chat_message" in received[0]
+    finally:
+        listener.close()
+
+
+def test_connection_reconnects_after_fork(tmp_path, monkeypatch) -> None:
+    socket_path = tmp_path / "ogd.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_path))
+    listener.listen()
+    accepted: list[int] = []
+    server = threading.Thread(target=_serve_connections, args=(listener, [1, 1], accepted))
+    server.start()
+    try:
+        with OGDConnection(socket_path) as conn:
+            assert send_request({"type": "ping"}, conn=conn) == {"ok": True}
+            inherited = conn._sock
+            monkeypatch.setattr(client_module.os, "getpid", lambda: -1)
+            assert send_request({"type": "ping"}, conn=conn) == {"ok": True}
+            assert conn._sock is not inherited
+        server.join(timeout=5)
+        assert accepted == [1, 1]
+    finally:
+        listener.close()
+
+
 def test_send_metric_builds_expected_payload(monkeypatch) -> None:
     captured: dict[str, object] = {}
 
@@ -76,3 +250,23 @@ def test_send_metric_builds_expected_payload(monkeypatch) -> None:
         },
         "socket_path": "/tmp/demo.sock",
     }
+
+
+def test_send_metrics_batches_values_into_one_request(monkeypatch) -> None:
+    captured: list[dict[str, object]] = []
+
+    def fake_send_request(payload: dict[str, object], socket_path: str) -> dict[str, bool]:
+        captured.append(payload)
+        return {"ok": True}
+
+    monkeypatch.setattr(client_module, "send_request", fake_send_request)
+
+    send_metrics({"train/loss": 0.5, "train/accuracy": 0.8}, step=3, socket_path="/tmp/demo.sock")
+
+    assert captured == [
+        {
+            "type": "metrics_batch",
+            "metrics": {"train/loss": 0.5, "train/accuracy": 0.8},
+            "step": 3,
+        }
+    ]
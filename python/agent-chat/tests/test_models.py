@@ -1,6 +1,13 @@
 from __future__ import annotations
 
-from og_agent_chat.models import ActionPlan, Alert, RunState
+from og_agent_chat.models import (
+    MAX_LOG_LINES,
+    MAX_METRIC_POINTS,
+    METRIC_TRIM_SLACK,
+    ActionPlan,
+    Alert,
+    RunState,
+)
 
 
 def test_run_state_helpers_track_latest_values_and_tails(tmp_path) -> None:
@@ -33,13 +40,40 @@ def test_run_state_helpers_track_latest_values_and_tails(tmp_path) -> None:
     state.add_alert(first)
     state.add_alert(latest)
 
-    assert state.metrics == {"loss": [1.5, 0.75, 0.5]}
+    assert state.metrics["loss"].tolist() == [1.5, 0.75, 0.5]
     assert state.metric_tail("loss", n=2) == [0.75, 0.5]
     assert state.current_step == 2
     assert state.log_tail(1) == "line 2"
     assert state.latest_alert() == latest
 
 
+def test_run_state_bounds_metric_history(tmp_path) -> None:
+    state = RunState(training_file=tmp_path / "train.py", codebase_root=tmp_path)
+    total = MAX_METRIC_POINTS + METRIC_TRIM_SLACK + 1
+
+    for value in range(total):
+        state.add_metric("loss", value)
+
+    assert len(state.metrics["loss"]) == MAX_METRIC_POINTS
+    assert state.metrics["loss"][-1] == float(total - 1)
+    assert state.metric_tail("loss", n=1) == [float(total - 1)]
+
+
+def test_run_state_keeps_a_bounded_log_ring(tmp_path) -> None:
+    state = RunState(training_file=tmp_path / "train.py", codebase_root=tmp_path)
+
+    for index in range(MAX_LOG_LINES + 5):
+        state.append_log(f"line {index}")
+
+    assert len(state.logs) == MAX_LOG_LINES
+    assert state.logs[0] == "line 5"
+    assert state.log_lines(2) == [f"line {MAX_LOG_LINES + 3}", f"line {MAX_LOG_LINES + 4}"]
+    assert state.log_tail(1) == f"line {MAX_LOG_LINES + 4}"
+
+    state.append_log("newest")
+    assert state.log_tail(1) == "newest"
+
+
 def test_action_plan_is_refactor_matches_action() -> None:
     explain = ActionPlan(
         diagnosis="Need checks",
@@ -56,3 +90,26 @@ def test_action_plan_is_refactor_matches_action() -> None:
 
     assert explain.is_refactor() is False
     assert refactor.is_refactor() is True
+
+
+def test_run_state_training_text_reuses_cache_until_file_changes(tmp_path, monkeypatch) -> None:
+    training_file = tmp_path / "train.py"
+    training_file.write_text("value = 1\n", encoding="utf-8")
+    state = RunState(training_file=training_file, codebase_root=tmp_path)
+    reads = {"count": 0}
+    original_read_text = type(training_file).read_text
+
+    def counting_read_text(self, *args, **kwargs):
+        reads["count"] += 1
+        return original_read_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(type(training_file), "read_text", counting_read_text)
+
+    assert state.training_text() == "value = 1\n"
+    assert state.training_text() == "value = 1\n"
+    assert reads["count"] == 1
+
+    training_file.write_text("value = 22\n", encoding="utf-8")
+
+    assert state.training_text() == "value = 22\n"
+    assert reads["count"] == 2
@@ -3,7 +3,12 @@ from __future__ import annotations
 import asyncio
 from pathlib import Path
 
-from og_agent_chat.runtime import LocalRuntimeAdapter, RuntimeFailure, _looks_like_oom_text
+from og_agent_chat.runtime import (
+    RECENT_LINE_LIMIT,
+    LocalRuntimeAdapter,
+    RuntimeFailure,
+    _looks_like_oom_text,
+)
 
 
 def _build_adapter(
@@ -43,6 +48,8 @@ def test_looks_like_oom_text_detects_common_failure_patterns() -> None:
     assert _looks_like_oom_text("CUDA out of memory while allocating") is True
     assert _looks_like_oom_text("Killed process after memory spike") is True
     assert _looks_like_oom_text("completed successfully") is False
+    assert _looks_like_oom_text("container OOMKilled") is True
+    assert _looks_like_oom_text("zoom level set; room for batch 64") is False
 
 
 def test_local_runtime_adapter_builds_env_and_command(tmp_path) -> None:
@@ -69,6 +76,26 @@ def test_local_runtime_adapter_builds_env_and_command(tmp_path) -> None:
     assert adapter._resolve_command() == ["python", "-m", "demo.train", "--epochs", "3"]
 
 
+def test_local_runtime_adapter_env_prefers_inherited_values_then_overrides(
+    tmp_path, monkeypatch
+) -> None:
+    monkeypatch.setenv("OGD_SOCKET", "/inherited.sock")
+    monkeypatch.setenv("ENABLE_TB", "0")
+    monkeypatch.delenv("TB_LOG_DIR", raising=False)
+    adapter = _build_adapter(
+        training_file=tmp_path / "train.py",
+        codebase_root=tmp_path,
+        socket_path=tmp_path / "ogd.sock",
+        runtime_env_overrides={"ENABLE_TB": "1"},
+    )
+
+    env = adapter._build_env()
+
+    assert env["OGD_SOCKET"] == "/inherited.sock"
+    assert env["ENABLE_TB"] == "1"
+    assert "TB_LOG_DIR" not in env
+
+
 def test_local_runtime_adapter_reports_completion_and_streams_logs(tmp_path) -> None:
     training_file = tmp_path / "train_ok.py"
     training_file.write_text("print('hello from runtime', flush=True)\n", encoding="utf-8")
@@ -146,3 +173,99 @@ def test_local_runtime_adapter_reports_oom_failures(tmp_path) -> None:
     assert len(failures) == 1
     assert failures[0].error_type == "LOCAL_OOM"
     assert failures[0].exit_code == 1
+
+
+def test_local_runtime_adapter_splits_chunked_output_into_lines(tmp_path) -> None:
+    training_file = tmp_path / "train_chunks.py"
+    training_file.write_text(
+        "import sys, time\n"
+        "out = sys.stdout.buffer\n"
+        "encoded = 'caf\\u00e9'.encode()\n"
+        "out.write(encoded[:-1]); out.flush(); time.sleep(0.05)\n"
+        "out.write(encoded[-1:] + b'\\r\\n' + b'x' * 100000 + b'\\nno newline\\r')\n",
+        encoding="utf-8",
+    )
+    logs: list[str] = []
+
+    async def scenario() -> None:
+        adapter = _build_adapter(
+            training_file=training_file,
+            codebase_root=tmp_path,
+            socket_path=tmp_path / "ogd.sock",
+            on_log=logs.append,
+        )
+        await adapter.start()
+        assert adapter._log_task is not None
+        await asyncio.wait_for(adapter._log_task, timeout=10)
+        await adapter.close()
+
+    asyncio.run(scenario())
+
+    output = [line for line in logs if not line.startswith("[system]")]
+    assert output == ["café", "x" * 100000, "no newline"]
+
+
+def test_local_runtime_adapter_only_counts_oom_markers_in_the_recent_window(tmp_path) -> None:
+    training_file = tmp_path / "train_late_crash.py"
+    training_file.write_text(
+        "import sys\n"
+        "print('CUDA out of memory', flush=True)\n"
+        f"print('\\n'.join(['recovered'] * {RECENT_LINE_LIMIT}), flush=True)\n"
+        "sys.exit(1)\n",
+        encoding="utf-8",
+    )
+    failures: list[RuntimeFailure] = []
+
+    async def on_failure(failure: RuntimeFailure) -> None:
+        failures.append(failure)
+
+    async def scenario() -> None:
+        adapter = _build_adapter(
+            training_file=training_file,
+            codebase_root=tmp_path,
+            socket_path=tmp_path / "ogd.sock",
+            on_failure=on_failure,
+        )
+        await adapter.start()
+        assert adapter._log_task is not None
+        await asyncio.wait_for(adapter._log_task, timeout=10)
+        await adapter.close()
+
+    asyncio.run(scenario())
+
+    assert [failure.error_type for failure in failures] == ["LOCAL_EXIT_NONZERO"]
+
+
+def test_local_runtime_adapter_stop_lets_a_detached_process_finish_its_sigterm_handler(
+    tmp_path,
+) -> None:
+    # Closing stdout does not mean the process is exiting: a script that
+    # redirects its output still needs the full grace period to checkpoint.
+    training_file = tmp_path / "train_detached.py"
+    marker = tmp_path / "checkpoint.done"
+    training_file.write_text(
+        "import os, signal, sys, time\n"
+        "def on_term(*_):\n"
+        "    time.sleep(1.0)\n"
+        f"    open({str(marker)!r}, 'w').close()\n"
+        "    sys.exit(0)\n"
+        "signal.signal(signal.SIGTERM, on_term)\n"
+        "os.close(1); os.close(2)\n"
+        "time.sleep(30)\n",
+        encoding="utf-8",
+    )
+
+    async def scenario() -> None:
+        adapter = _build_adapter(
+            training_file=training_file,
+            codebase_root=tmp_path,
+            socket_path=tmp_path / "ogd.sock",
+        )
+        await adapter.start()
+        # Give the script time to install its handler and close its output.
+        await asyncio.sleep(0.5)
+        await adapter.close()
+
+    asyncio.run(scenario())
+
+    assert marker.exists()
@@ -103,12 +103,58 @@ def test_handle_payload_metrics_update_can_trigger_alert_callbacks(tmp_path) ->
     assert response["ok"] is True
     assert response["alert"]["metric"] == "train/loss"
     assert response["agent_response"]["diagnosis"] == "Investigated alert"
-    assert run_state.metrics["train/loss"] == [0.9]
+    assert run_state.metrics["train/loss"].tolist() == [0.9]
     assert run_state.current_step == 4
     assert len(run_state.alerts) == 1
     assert len(agent.seen_alerts) == 1
 
 
+def test_handle_payload_metrics_batch_records_all_metrics_and_alerts(tmp_path) -> None:
+    run_state = RunState(training_file=tmp_path / "train.py", codebase_root=tmp_path)
+    agent = StubAgent()
+    detector = AlertDetector(
+        [
+            ThresholdRule(
+                metric="train/loss",
+                threshold=0.5,
+                comparison="gt",
+                cooldown_secs=0.0,
+            )
+        ]
+    )
+
+    response = asyncio.run(
+        _handle_payload(
+            {
+                "type": "metrics_batch",
+                "metrics": {"train/loss": 0.9, "train/accuracy": 0.4},
+                "step": 6,
+            },
+            run_state,
+            agent,
+            detector,
+        )
+    )
+    invalid = asyncio.run(
+        _handle_payload(
+            {"type": "metrics_batch", "metrics": {"train/loss": "nan?"}},
+            run_state,
+            agent,
+            detector,
+        )
+    )
+
+    assert response["ok"] is True
+    assert [alert["metric"] for alert in response["alerts"]] == ["train/loss"]
+    assert response["agent_responses"][0]["diagnosis"] == "Investigated alert"
+    assert {name: values.tolist() for name, values in run_state.metrics.items()} == {
+        "train/loss": [0.9],
+        "train/accuracy": [0.4],
+    }
+    assert run_state.current_step == 6
+    assert invalid == {"ok": False, "error": "invalid_value"}
+
+
 def test_handle_payload_supports_runtime_controls_and_state_queries(tmp_path) -> None:
     run_state = RunState(training_file=tmp_path / "train.py", codebase_root=tmp_path)
     run_state.add_metric("runtime/health", 1.0, step=2)